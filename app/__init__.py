@@ -7,6 +7,8 @@ from dotenv import load_dotenv
 
 from app.main import main as main_blueprint
 from app.auth import auth as auth_blueprint
+from app.email import email_templates, outbox_sender
+from app.entities.entity import Session
 from app.main.stats import stats as stats_blueprint
 from app.main.create import crt as create_blueprint
 from app.main.update import updt as update_blueprint
@@ -30,6 +32,8 @@ def create_app(config_name):
     bootstrap.init_app(app)
     moment.init_app(app)
     db.init_app(app)
+    email_templates.init_app(app)
+    outbox_sender.init_app(app)
 
     app.register_blueprint(main_blueprint, url_prefix='/main')
     app.register_blueprint(stats_blueprint, url_prefix='/main/stats')
@@ -42,4 +46,9 @@ def create_app(config_name):
     CORS(app)
     app.config['CORS_HEADERS'] = 'Content-Type'
 
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        # returns the connection of sessions left open by a handler to the pool
+        Session.remove()
+
     return app
@@ -1,5 +1,3 @@
-import ast
-import base64
 import datetime
 import os
 
@@ -10,10 +8,13 @@ from itsdangerous import TimedJSONWebSignatureSerializer
 from flask_httpauth import HTTPBasicAuth
 
 from app.entities.user import User, UserInsertSchema, UserAttributes
-from app.entities.entity import Session
+from app.entities.entity import Session, cached_schema
 from app.email import send_email
 from app.main.error_handling import investigate_integrity_error
 from app.utils import responses
+from app.utils.auth_cache import Principal, token_cache
+from app.utils.hashing import HashingSaturated
+from app.utils.request_spec import parse_spec
 from app.utils.responses import ResponseMessages, create_response
 
 # create blueprint for all authentication endpoints
@@ -69,6 +70,18 @@ def process_consent(typ, token):
         return create_response(user, responses.SUCCESS_200, ResponseMessages.AUTH_USER_CONFIRMED, User.__name__, 200)
 
 
+@auth.app_errorhandler(HashingSaturated)
+def hashing_saturated(e):
+    """
+    rejects requests needing a password hash while the hashing pool is saturated, instead of queueing them
+    Returns:
+        Flask response with Retry-After header
+    """
+    resp = create_response(None, responses.SERVICE_UNAVAILABLE_503, ResponseMessages.AUTH_BUSY, User.__name__, 503)
+    resp.headers['Retry-After'] = '1'
+    return resp
+
+
 @http_auth.verify_password
 def verify_password(email_or_token, password):
     """
@@ -80,24 +93,35 @@ def verify_password(email_or_token, password):
     Returns:
         Flask response, consisting of response code, response message, affected class, and http code
     """
-    session = Session()
     if email_or_token == '':
         return False
     if password == '':  # password is not provided when auth token is used
-        http_auth.current_user = User.verify_auth_token(email_or_token, session)
+        principal = token_cache.get(email_or_token)
+
+        if principal is None:
+            session = Session()
+            user, expires_at = User.verify_auth_token(email_or_token, session)
+            if user is not None:
+                principal = Principal.of(user)
+                token_cache.set(email_or_token, principal, expires_at)
+            session.expunge_all()
+            session.close()
+
+        http_auth.current_user = principal
         http_auth.token_used = True
-        session.expunge_all()
-        session.close()
         return http_auth.current_user is not None
+
+    session = Session()
     user = session.query(User).filter(or_(User.email == email_or_token,
                                           User.username == email_or_token)).first()
+    principal = Principal.of(user) if user is not None else None
 
     session.expunge_all()
     session.close()
 
-    if not user.verify_password(password):
+    if user is None or not user.verify_password(password):
         return False
-    http_auth.current_user = user
+    http_auth.current_user = principal
     http_auth.token_used = False
     return create_response(False, responses.UNAUTHORIZED_403, ResponseMessages.AUTH_INVALID_PARAMS, User.__name__, 403)
 
@@ -127,11 +151,9 @@ def get_token(data_encoded):
     session = Session()
     user = http_auth.current_user
 
-    data_string = base64.b64decode(data_encoded).decode()
-    data = ast.literal_eval(data_string)
+    data = parse_spec(data_encoded)
 
-    if user not in session:
-        user = session.query(User).get(user.id)
+    user = session.query(User).get(user.id)
 
     if http_auth.current_user is None or http_auth.token_used:
         return create_response(None, responses.UNAUTHORIZED_403, ResponseMessages.AUTH_INVALID_PARAMS,
@@ -156,7 +178,7 @@ def create_user():
     data = request.get_json()
 
     session = Session()
-    user_schema = UserInsertSchema()
+    user_schema = cached_schema(UserInsertSchema)
     user = User(**user_schema.load(data))
     res = None
     try:
@@ -222,7 +244,12 @@ def resend_confirmation():
     """
     # TODO: change to BASE64 decoded JSON
     data = request.get_json()
-    curr_user = http_auth.current_user
+    curr_user = None
+    if http_auth.current_user is not None:
+        session = Session()
+        curr_user = session.query(User).get(http_auth.current_user.id)
+        session.expunge_all()
+        session.close()
     if curr_user is not None:
         if curr_user.confirmed:
             curr_user = curr_user.serialize()
@@ -254,7 +281,7 @@ def change_password():
     data = request.get_json()
     session = Session()
 
-    user = http_auth.current_user
+    user = session.query(User).get(http_auth.current_user.id) if http_auth.current_user is not None else None
     if user is None:
         session.expunge_all()
         session.close()
@@ -340,7 +367,7 @@ def change_email_request():
     data = request.get_json()
     session = Session()
 
-    user = http_auth.current_user
+    user = session.query(User).get(http_auth.current_user.id) if http_auth.current_user is not None else None
     if user is None:
         session.expunge_all()
         session.close()
@@ -414,8 +441,7 @@ def get_user(data_encoded):
     """
     user = http_auth.current_user
 
-    data_string = base64.b64decode(data_encoded).decode()
-    data = ast.literal_eval(data_string)
+    data = parse_spec(data_encoded)
 
     session = Session()
 
@@ -423,8 +449,7 @@ def get_user(data_encoded):
 
     if user is not None:
 
-        if user not in session:
-            user = session.query(User).get(user.id)
+        user = session.query(User).get(user.id)
 
         token = {'token': user.generate_auth_token(expiration=1200,
                                                    session=session),
@@ -434,3 +459,26 @@ def get_user(data_encoded):
                                ResponseMessages.AUTH_LOGIN_SUCCESSFUL, User, 200)
     else:
         return create_response(None, responses.UNAUTHORIZED_403, ResponseMessages.AUTH_LOGIN_FAILED, User, 403)
+
+
+@auth.route('/logout', methods=['GET', 'POST'])
+@http_auth.login_required
+def logout():
+    """
+    Endpoint to log out, invalidates all auth tokens of the user
+    Returns:
+        Flask response, consisting of response code, response message, affected class, and http code
+    """
+    session = Session()
+    user = session.query(User).get(http_auth.current_user.id)
+
+    if user is None:
+        session.close()
+        return create_response(None, responses.INVALID_INPUT_422, ResponseMessages.AUTH_INVALID_PARAMS,
+                               User.__name__, 422)
+
+    user.revoke_auth_tokens(session, user.username)
+    session.expunge_all()
+    session.close()
+
+    return create_response(True, responses.SUCCESS_200, ResponseMessages.AUTH_LOGOUT_SUCCESSFUL, User.__name__, 200)
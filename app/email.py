@@ -1,27 +1,322 @@
-import codecs
+import logging
 import smtplib
 import ssl
+import string
+import threading
+import time
+from datetime import datetime, timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from pathlib import Path
 from flask import current_app
 
+from app.entities.entity import session_factory
+from app.entities.outbox import OutboxMessage, OutboxStatus
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = Path(__file__).parent / 'templates'
+TEMPLATE_PARTS = ('txt', 'html')
+
+
+class TemplateError(ValueError):
+    """
+    raised for email templates which are incomplete or malformed and for missing placeholder values
+    """
+
+
+class EmailTemplate:
+    """
+    plain text and HTML part of an email together with the names of their placeholders
+    """
+
+    def __init__(self, name, parts, mtime):
+        self.name = name
+        self.parts = parts
+        self.mtime = mtime
+        self.fields = self.placeholders(name, parts['txt'])
+
+        if self.placeholders(name, parts['html']) != self.fields:
+            raise TemplateError('template {}: the text and HTML part use different placeholders'.format(name))
+
+    @staticmethod
+    def placeholders(name, text):
+        try:
+            fields = {f for _, f, _, _ in string.Formatter().parse(text) if f is not None}
+        except ValueError as e:
+            raise TemplateError('template {}: {}'.format(name, e))
+
+        if '' in fields or any(not f.isidentifier() for f in fields):
+            raise TemplateError('template {}: placeholders must be named'.format(name))
+
+        return frozenset(fields)
+
+    def render(self, **kwargs):
+        """
+        :return: rendered text and HTML part
+        :raises TemplateError: if a placeholder value is missing
+        """
+        missing = self.fields - kwargs.keys()
+        if missing:
+            raise TemplateError('template {}: missing values for {}'.format(self.name, ', '.join(sorted(missing))))
+
+        return self.parts['txt'].format_map(kwargs), self.parts['html'].format_map(kwargs)
+
+
+class TemplateRegistry:
+    """
+    email templates loaded and validated once, so that rendering an email needs no disk access,
+    with reload set a template is read again whenever one of its files has changed
+    """
+
+    def __init__(self, directory=TEMPLATE_DIR):
+        self.directory = Path(directory)
+        self.reload = False
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        loads all templates under email/, an invalid template prevents the app from starting
+        """
+        self.reload = app.config['MAIL_TEMPLATE_RELOAD']
+        self.load_all()
+
+    def _paths(self, name):
+        return {part: self.directory / '{}.{}'.format(name, part) for part in TEMPLATE_PARTS}
+
+    def _load(self, name):
+        paths = self._paths(name)
+
+        try:
+            parts = {part: path.read_text(encoding='utf-8') for part, path in paths.items()}
+            mtime = max(path.stat().st_mtime for path in paths.values())
+        except OSError as e:
+            raise TemplateError('template {}: {}'.format(name, e))
+
+        return EmailTemplate(name, parts, mtime)
+
+    def load_all(self):
+        names = {p.relative_to(self.directory).with_suffix('').as_posix()
+                 for p in (self.directory / 'email').rglob('*') if p.suffix[1:] in TEMPLATE_PARTS}
+        templates = {name: self._load(name) for name in sorted(names)}
+
+        with self._lock:
+            self._templates = templates
+
+    def get(self, name):
+        """
+        :param name: path of the template without suffix relative to the templates directory, e.g. 'email/confirm'
+        :return: the template
+        """
+        template = self._templates.get(name)
+
+        if self.reload:
+            try:
+                mtime = max(path.stat().st_mtime for path in self._paths(name).values())
+            except OSError:
+                mtime = None
+
+            if template is None or mtime != template.mtime:
+                template = self._load(name)
+                with self._lock:
+                    self._templates[name] = template
+
+        if template is None:
+            raise TemplateError('unknown template {}'.format(name))
+
+        return template
+
+    def __len__(self):
+        return len(self._templates)
+
+
+email_templates = TemplateRegistry()
+
 
 def send_email(to, subject, template, **kwargs):
+    """
+    renders the template and stores the email in the outbox, it is sent by the background sender
+    """
+    body, html = email_templates.get(template).render(**kwargs)
+
+    # own session, so that committing the email does not commit or expire the objects of the request
+    session = session_factory()
+    OutboxMessage(to, current_app.config['MAIL_SUBJECT_PREFIX'] + ' ' + subject, body, html).create(session)
+    session.close()
+
+    outbox_sender.notify()
+
+
+class OutboxSender:
+    """
+    background thread sending the pending emails of the outbox in batches over one SMTP connection, which is kept
+    open while emails arrive and closed once it has been idle for MAIL_CONNECTION_IDLE seconds,
+    failed emails are retried with exponential backoff, several processes may share the outbox since claimed rows
+    are locked with SKIP LOCKED
+    """
+
+    def __init__(self):
+        self.config = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.connections = 0
+        self._server = None
+        self._last_used = 0.0
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        copies the mail settings of the app, if MAIL_OUTBOX_WORKER is set the sender is started with the first
+        request, so that CLI commands like flask test or flask shell do not poll the outbox
+        """
+        self.config = {k: v for k, v in app.config.items() if k.startswith('MAIL_')}
+
+        if self.config['MAIL_OUTBOX_WORKER']:
+            app.before_first_request(self.start)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+                self._thread.start()
+
+    def notify(self):
+        """
+        wakes the sender up after an email has been stored
+        """
+        self._wakeup.set()
+
+    def _run(self):
+        interval = min(self.config['MAIL_OUTBOX_POLL_INTERVAL'], self.config['MAIL_CONNECTION_IDLE'])
+
+        while True:
+            self._wakeup.wait(timeout=interval)
+            self._wakeup.clear()
+
+            try:
+                while self.send_pending() == self.config['MAIL_OUTBOX_BATCH_SIZE']:
+                    pass
+            except Exception:
+                logger.exception('sending the email outbox failed')
+
+            if self._server is not None and time.monotonic() - self._last_used > self.config['MAIL_CONNECTION_IDLE']:
+                self._close()
+
+    def send_pending(self):
+        """
+        sends one batch of due emails
+        :return: number of emails claimed, a full batch means that more may be due
+        """
+        session = session_factory()
+
+        try:
+            messages = session.query(OutboxMessage) \
+                .filter(OutboxMessage.status == OutboxStatus.PENDING, OutboxMessage.next_attempt_at <= datetime.now()) \
+                .order_by(OutboxMessage.id) \
+                .limit(self.config['MAIL_OUTBOX_BATCH_SIZE']) \
+                .with_for_update(skip_locked=True) \
+                .all()
+
+            if len(messages) == 0:
+                return 0
+
+            try:
+                self._connection()
+            except (smtplib.SMTPException, OSError) as e:
+                # the server is not reachable, all claimed emails are delayed
+                logger.warning('connecting to the mail server failed: %s', e)
+                for message in messages:
+                    self._retry_later(message, e)
+                session.commit()
+                return 0
+
+            for message in messages:
+                try:
+                    self._send(message)
+                except (smtplib.SMTPException, OSError) as e:
+                    self._retry_later(message, e)
+
+                    # the server rejected this email only, others can still be sent over the connection
+                    if not isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException)):
+                        self._close()
+                        break
+                else:
+                    message.status = OutboxStatus.SENT
+                    message.sent_at = datetime.now()
+                    self.sent += 1
+
+            session.commit()
+
+            return len(messages)
+        finally:
+            session.close()
+
+    def _retry_later(self, message, error):
+        message.attempts += 1
+        message.last_error = str(error)[:500]
+
+        if message.attempts >= self.config['MAIL_MAX_ATTEMPTS']:
+            message.status = OutboxStatus.FAILED
+            self.failed += 1
+            logger.error('giving up on email %s to %s: %s', message.id, message.recipient, error)
+        else:
+            delay = self.config['MAIL_RETRY_BACKOFF'] * 2 ** (message.attempts - 1)
+            message.next_attempt_at = datetime.now() + timedelta(seconds=delay)
+            self.retried += 1
+
+    def _connection(self):
+        if self._server is None:
+            if self.config['MAIL_USE_TLS']:
+                server = smtplib.SMTP_SSL(self.config['MAIL_SERVER'], self.config['MAIL_PORT'],
+                                          context=ssl.create_default_context(), timeout=self.config['MAIL_TIMEOUT'])
+            else:
+                # plain connection, e.g. to a local SMTP stand-in
+                server = smtplib.SMTP(self.config['MAIL_SERVER'], self.config['MAIL_PORT'],
+                                      timeout=self.config['MAIL_TIMEOUT'])
+
+            if self.config['MAIL_USERNAME']:
+                server.login(self.config['MAIL_USERNAME'], self.config['MAIL_PASSWORD'])
+
+            self._server = server
+            self.connections += 1
+
+        return self._server
+
+    def _close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+    def _send(self, message):
+        msg = MIMEMultipart('alternative')
+        msg["Subject"] = message.subject
+        msg["From"] = self.config['MAIL_SENDER']
+        msg["To"] = message.recipient
+
+        msg.attach(MIMEText(message.body_text, 'plain'))
+        msg.attach(MIMEText(message.body_html, 'html'))
 
-    msg = MIMEMultipart('alternative')
-    msg["Subject"] = current_app.config['MAIL_SUBJECT_PREFIX'] + ' ' + subject
-    msg["From"] = current_app.config['MAIL_SENDER']
-    msg["To"] = to
+        try:
+            self._connection().sendmail(self.config['MAIL_SENDER'], message.recipient, msg.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # the server may have closed the idle connection meanwhile
+            self._close()
+            self._connection().sendmail(self.config['MAIL_SENDER'], message.recipient, msg.as_string())
+        self._last_used = time.monotonic()
 
-    body = codecs.open('app/templates/' + template + '.txt', 'r', 'utf-8').read().format(**kwargs)
-    html = codecs.open('app/templates/' + template + '.html', 'r', 'utf-8').read().format(**kwargs)
+    def stats(self):
+        """
+        :return: dict holding the number of sent, retried and failed emails and opened SMTP connections
+        """
+        return {'sent': self.sent, 'retried': self.retried, 'failed': self.failed, 'connections': self.connections,
+                'running': self._thread is not None and self._thread.is_alive()}
 
-    msg.attach(MIMEText(body, 'plain'))
-    msg.attach(MIMEText(html, 'html'))
 
-    ssl_context = ssl.create_default_context()
-    with smtplib.SMTP_SSL(current_app.config['MAIL_SERVER'],
-                          current_app.config['MAIL_PORT'],
-                          context=ssl_context) as server:
-        server.login(current_app.config["MAIL_USERNAME"], current_app.config["MAIL_PASSWORD"])
-        server.sendmail(current_app.config['MAIL_SENDER'], to, msg.as_string())
+outbox_sender = OutboxSender()
@@ -1,19 +1,38 @@
 # coding=utf-8
 
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, Boolean
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Boolean, Computed, Index, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from marshmallow import Schema, fields
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from enum import Enum
 
-from app.entities.activity_type import ActivityType
-from app.entities.comment import Comment
-from app.entities.entity import Entity, Base, EntitySchema
-from app.entities.user import User
+from app.entities.activity_type import ActivityType, ActivityTypeAttributes
+from app.entities.comment import Comment, CommentAttributes
+from app.entities.country import CountryAttributes
+from app.entities.entity import Entity, Base, EntitySchema, cached_schema
+from app.entities.location import LocationAttributes
+from app.entities.location_type import LocationTypeAttributes
+from app.entities.region import RegionAttributes
+from app.entities.user import User, UserAttributes
+from app.utils.autocomplete import name_index
+
+
+# names are weighted higher than descriptions, the german configuration handles stemming and stop words of the
+# mostly german data, the simple configuration keeps the unmodified words (e.g. names of places)
+SEARCH_VECTOR = "setweight(to_tsvector('german', coalesce(name, '')), 'A') || " \
+                "setweight(to_tsvector('german', coalesce(description, '')), 'B') || " \
+                "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || " \
+                "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
 
 
 class Activity(Entity, Base):
     __tablename__ = 'activities'
+    __table_args__ = (Index('ix_activities_search_vector', 'search_vector', postgresql_using='gin'),
+                      Index('ix_activities_name_trgm', 'name', postgresql_using='gin',
+                            postgresql_ops={'name': 'gin_trgm_ops'}),
+                      Index('ix_activities_description_trgm', 'description', postgresql_using='gin',
+                            postgresql_ops={'description': 'gin_trgm_ops'}))
 
     name = Column(String, nullable=False)
     description = Column(Text)
@@ -25,6 +44,7 @@ class Activity(Entity, Base):
     activity_type = relationship(ActivityType, foreign_keys=[activity_type_id])
     locations = relationship('LocationActivity', uselist=True, backref='activities')
     comments = relationship(Comment, foreign_keys=[Comment.activity_id])
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR, persisted=True)))
 
     def __init__(self, name, description, activity_type_id, source, save_path, multi_day, created_by):
         Entity.__init__(self)
@@ -40,6 +60,7 @@ class Activity(Entity, Base):
 
         session.add(self)
         session.commit()
+        name_index.update(self.__class__.__name__, self.id, self.name)
 
         return self
 
@@ -53,9 +74,10 @@ class Activity(Entity, Base):
 
         session.add(self)
         session.commit()
+        name_index.update(self.__class__.__name__, self.id, self.name)
 
     def convert_to_insert_schema(self):
-        schema = ActivityInsertSchema()
+        schema = cached_schema(ActivityInsertSchema)
         dump = schema.dump(self)
         return dump
 
@@ -101,18 +123,45 @@ class Activity(Entity, Base):
     def get_region_all(self, output='id'):
         return [getattr(self.locations[idx].location.region, output) for idx in range(len(self.locations))], 'regions'
 
+    @staticmethod
+    def search_query(term):
+        """
+        full text query matching the term in the german or the simple configuration
+        """
+        return func.plainto_tsquery('german', term).op('||')(func.plainto_tsquery('simple', term))
+
     @staticmethod
     def get_insert_schema():
-        return ActivityInsertSchema()
+        return cached_schema(ActivityInsertSchema)
 
     @staticmethod
     def get_schema(many, only):
-        return ActivitySchema(many=many, only=only)
+        return cached_schema(ActivitySchema, many=many, only=only)
 
     @staticmethod
     def get_attributes():
         return ActivityAttributes
 
+    @staticmethod
+    def get_enrichments():
+        return {
+            Activity.get_activity_type.__name__: ActivityTypeAttributes,
+            Activity.get_comment.__name__: CommentAttributes,
+            Activity.get_comment_all.__name__: CommentAttributes,
+            Activity.get_country.__name__: CountryAttributes,
+            Activity.get_country_all.__name__: CountryAttributes,
+            Activity.get_hiker.__name__: UserAttributes,
+            Activity.get_hiker_all.__name__: UserAttributes,
+            # always returns the username
+            Activity.get_last_editor.__name__: None,
+            Activity.get_location.__name__: LocationAttributes,
+            Activity.get_location_all.__name__: LocationAttributes,
+            Activity.get_location_type.__name__: LocationTypeAttributes,
+            Activity.get_location_type_all.__name__: LocationTypeAttributes,
+            Activity.get_region.__name__: RegionAttributes,
+            Activity.get_region_all.__name__: RegionAttributes,
+        }
+
 
 class ActivitySchema(EntitySchema):
     name = fields.String()
@@ -4,7 +4,7 @@ from enum import Enum
 from marshmallow import fields, Schema
 from sqlalchemy import Column, Integer, ForeignKey, Text, Boolean
 
-from app.entities.entity import Entity, Base, EntitySchema
+from app.entities.entity import Entity, Base, EntitySchema, cached_schema
 
 
 class Comment(Entity, Base):
@@ -46,7 +46,7 @@ class Comment(Entity, Base):
         session.commit()
 
     def convert_to_insert_schema(self):
-        schema = CommentInsertSchema()
+        schema = cached_schema(CommentInsertSchema)
         return schema.dump(self)
 
     def get_author(self, output='username'):
@@ -54,11 +54,11 @@ class Comment(Entity, Base):
 
     @staticmethod
     def get_insert_schema():
-        return CommentInsertSchema()
+        return cached_schema(CommentInsertSchema)
 
     @staticmethod
     def get_schema(many, only):
-        return CommentSchema(many=many, only=only)
+        return cached_schema(CommentSchema, many=many, only=only)
 
     @staticmethod
     def get_attributes():
@@ -1,15 +1,18 @@
 # coding=utf-8
 from enum import Enum
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
 from marshmallow import Schema, fields
 from datetime import datetime
 
-from app.entities.entity import Entity, EntitySchema, Base
+from app.entities.entity import Entity, EntitySchema, Base, cached_schema
 from app.entities.user import User
+from app.utils.autocomplete import name_index
 
 
 class Country(Entity, Base):
     __tablename__ = 'countries'
+    __table_args__ = (Index('ix_countries_name_trgm', 'name', postgresql_using='gin',
+                            postgresql_ops={'name': 'gin_trgm_ops'}),)
 
     name = Column(String, nullable=False, unique=True)
     abbreviation = Column(String, nullable=False)
@@ -25,6 +28,7 @@ class Country(Entity, Base):
 
         session.add(self)
         session.commit()
+        name_index.update(self.__class__.__name__, self.id, self.name)
 
         return self
 
@@ -38,9 +42,10 @@ class Country(Entity, Base):
 
         session.add(self)
         session.commit()
+        name_index.update(self.__class__.__name__, self.id, self.name)
 
     def convert_to_insert_schema(self):
-        schema = CountryInsertSchema()
+        schema = cached_schema(CountryInsertSchema)
         return schema.dump(self)
 
     def get_last_editor(self, session):
@@ -48,11 +53,11 @@ class Country(Entity, Base):
 
     @staticmethod
     def get_insert_schema():
-        return CountryInsertSchema()
+        return cached_schema(CountryInsertSchema)
 
     @staticmethod
     def get_schema(many, only):
-        return CountrySchema(many=many, only=only)
+        return cached_schema(CountrySchema, many=many, only=only)
 
     @staticmethod
     def get_attributes():
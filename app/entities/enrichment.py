@@ -0,0 +1,188 @@
+# coding=utf-8
+"""
+Batched resolution of the enrichments of activities, see Entity.serialize
+"""
+
+from collections import defaultdict
+
+from app.entities.activity import Activity
+from app.entities.activity_type import ActivityType
+from app.entities.comment import Comment
+from app.entities.country import Country
+from app.entities.hike_relations import HikeRelation
+from app.entities.location import Location
+from app.entities.location_activity import LocationActivity
+from app.entities.location_type import LocationType
+from app.entities.region import Region
+from app.entities.user import User
+
+# enrich method of Activity: (label, relation, whether all related entities or the first one are returned)
+ENRICHMENTS = {
+    Activity.get_activity_type.__name__: ('activity_type', 'activity_types', False),
+    Activity.get_comment.__name__: ('comment', 'comments', False),
+    Activity.get_comment_all.__name__: ('comments', 'comments', True),
+    Activity.get_country.__name__: ('country', 'countries', False),
+    Activity.get_country_all.__name__: ('countries', 'countries', True),
+    Activity.get_hiker.__name__: ('hiker', 'hikers', False),
+    Activity.get_hiker_all.__name__: ('hikers', 'hikers', True),
+    Activity.get_last_editor.__name__: ('editor', 'editors', False),
+    Activity.get_location.__name__: ('location', 'locations', False),
+    Activity.get_location_all.__name__: ('locations', 'locations', True),
+    Activity.get_location_type.__name__: ('location_type', 'location_types', False),
+    Activity.get_location_type_all.__name__: ('location_types', 'location_types', True),
+    Activity.get_region.__name__: ('region', 'regions', False),
+    Activity.get_region_all.__name__: ('regions', 'regions', True),
+}
+
+
+class EnrichmentLoader:
+    """
+    collects the foreign keys of all activities and fetches every relation with one IN query, a relation is only
+    fetched once it is needed by an enrichment
+    """
+
+    def __init__(self, session, activities):
+        self.session = session
+        self.activities = activities
+        self._entities = {}
+        self._links = None
+        self._comments = None
+        self._hikers = None
+
+    def _by_id(self, class_type, ids):
+        """
+        Returns:
+            dict mapping id to entity, entities already fetched are not fetched again
+        """
+        entities = self._entities.setdefault(class_type, {})
+        missing = set(ids) - entities.keys()
+
+        if len(missing) > 0:
+            entities.update((e.id, e) for e in self.session.query(class_type).filter(class_type.id.in_(missing)))
+
+        return entities
+
+    def _location_ids(self):
+        if self._links is None:
+            self._links = defaultdict(list)
+            for activity_id, location_id in self.session.query(LocationActivity.activity_id,
+                                                               LocationActivity.location_id) \
+                    .filter(LocationActivity.activity_id.in_([a.id for a in self.activities])) \
+                    .order_by(LocationActivity.id):
+                self._links[activity_id].append(location_id)
+
+        return self._links
+
+    def _locations(self):
+        links = self._location_ids()
+        locations = self._by_id(Location, {i for ids in links.values() for i in ids})
+
+        return {activity_id: [locations[i] for i in ids] for activity_id, ids in links.items()}
+
+    def related(self, relation):
+        """
+        Returns:
+            dict mapping activity id to the list of related entities
+        """
+        activity_ids = [a.id for a in self.activities]
+
+        if relation == 'activity_types':
+            types = self._by_id(ActivityType, {a.activity_type_id for a in self.activities})
+            return {a.id: [types[a.activity_type_id]] for a in self.activities}
+
+        if relation == 'editors':
+            users = self._by_id(User, {a.last_updated_by for a in self.activities})
+            return {a.id: [users[a.last_updated_by]] for a in self.activities}
+
+        if relation == 'comments':
+            if self._comments is None:
+                self._comments = defaultdict(list)
+                for c in self.session.query(Comment).filter(Comment.activity_id.in_(activity_ids)).order_by(Comment.id):
+                    self._comments[c.activity_id].append(c)
+            return self._comments
+
+        if relation == 'hikers':
+            if self._hikers is None:
+                self._hikers = defaultdict(list)
+                for activity_id, user in self.session.query(HikeRelation.activity_id, User) \
+                        .join(User, HikeRelation.user_id == User.id) \
+                        .filter(HikeRelation.activity_id.in_(activity_ids)) \
+                        .order_by(HikeRelation.id):
+                    self._hikers[activity_id].append(user)
+            return self._hikers
+
+        locations = self._locations()
+
+        if relation == 'locations':
+            return locations
+
+        if relation == 'location_types':
+            types = self._by_id(LocationType, {loc.location_type_id for locs in locations.values() for loc in locs})
+            return {activity_id: [types[loc.location_type_id] for loc in locs]
+                    for activity_id, locs in locations.items()}
+
+        regions = self._by_id(Region, {loc.region_id for locs in locations.values() for loc in locs})
+        regions = {activity_id: [regions[loc.region_id] for loc in locs] for activity_id, locs in locations.items()}
+
+        if relation == 'regions':
+            return regions
+
+        countries = self._by_id(Country, {r.country_id for regs in regions.values() for r in regs})
+
+        return {activity_id: [countries[r.country_id] for r in regs] for activity_id, regs in regions.items()}
+
+    def enrich(self, enrich):
+        """
+        Args:
+            enrich: dict mapping enrich method of Activity to the attribute of the related entities to return
+
+        Returns:
+            list holding a dict of enrichments per activity
+        """
+        results = [{} for _ in self.activities]
+
+        for method, output in (enrich or {}).items():
+            if method not in ENRICHMENTS:
+                # enrichments without a batched counterpart are resolved per activity
+                for idx, a in enumerate(self.activities):
+                    result, label = getattr(Activity, method)(a, output=output)
+                    results[idx][label] = result
+                continue
+
+            label, relation, many = ENRICHMENTS[method]
+            if relation == 'editors':
+                output = 'username'
+            related = self.related(relation)
+
+            for idx, a in enumerate(self.activities):
+                entities = related.get(a.id, [])
+                if many:
+                    results[idx][label] = [getattr(e, output) for e in entities]
+                else:
+                    results[idx][label] = getattr(entities[0], output) if len(entities) > 0 else None
+
+        return results
+
+
+def serialize_activities(session, activities, only=['id'], enrich=None):
+    """
+    serializes activities like Activity.serialize, the enrichments of all activities are resolved together
+    Args:
+        session: database session
+        activities: list of activities
+        only: attributes of the activities to serialize
+        enrich: dict mapping enrich method of Activity to the attribute of the related entities to return
+
+    Returns:
+        list of serialized activities
+    """
+    schema = Activity.get_schema(many=False, only=only)
+    enrichments = EnrichmentLoader(session, activities).enrich(enrich)
+
+    results = []
+    for a, enrichment in zip(activities, enrichments):
+        act = schema.dump(a)
+        act.update(enrichment)
+        results.append(act)
+
+    return results
@@ -1,39 +1,153 @@
 # coding=utf-8
 import os
+import threading
+import time
 
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, DateTime
+from functools import lru_cache
+from flask import _app_ctx_stack
+from sqlalchemy import create_engine, exc, Column, Integer, DateTime
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
 from marshmallow import Schema, fields
 from dotenv import load_dotenv
 from enum import Enum
 
+from config import Config, config
+
 load_dotenv('../.env')
 
+
+class TimedQueuePool(QueuePool):
+    """
+    queue pool which measures how long checkouts wait for a free connection
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.monotonic()
+
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            wait = time.monotonic() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_time += wait
+                self.max_wait_time = max(self.max_wait_time, wait)
+
+    def recreate(self):
+        # keeps the metrics when the pool is recreated after a disconnect
+        pool = super().recreate()
+        pool.checkouts, pool.timeouts = self.checkouts, self.timeouts
+        pool.wait_time, pool.max_wait_time = self.wait_time, self.max_wait_time
+        return pool
+
+    def stats(self):
+        """
+        Returns:
+            dict holding the pool size, connections in use and the checkout wait times in milliseconds
+        """
+        with self._stats_lock:
+            return {'size': self.size(), 'checkedOut': self.checkedout(), 'overflow': self.overflow(),
+                    'checkouts': self.checkouts, 'timeouts': self.timeouts,
+                    'avgWaitMs': round(self.wait_time / max(self.checkouts, 1) * 1000, 3),
+                    'maxWaitMs': round(self.max_wait_time * 1000, 3)}
+
+
+pool_config = config.get(os.environ.get('FLASK_CONFIG'), config['default'])
+pool_options = {
+    'poolclass': TimedQueuePool,
+    'pool_size': pool_config.DATABASE_POOL_SIZE,
+    'max_overflow': pool_config.DATABASE_MAX_OVERFLOW,
+    'pool_timeout': pool_config.DATABASE_POOL_TIMEOUT,
+    'pool_recycle': pool_config.DATABASE_POOL_RECYCLE,
+    'pool_pre_ping': pool_config.DATABASE_POOL_PRE_PING
+}
+
 engine = None
 if os.environ.get('FLASK_CONFIG') == 'prod':
     engine = create_engine('postgresql://{}:{}@{}/{}'.format(os.environ.get('PROD_DATABASE_USER'),
                                                              os.environ.get('PROD_DATABASE_PASSWORD'),
                                                              os.environ.get('PROD_DATABASE_HOST'),
-                                                             os.environ.get('PROD_DATABASE_NAME')))
+                                                             os.environ.get('PROD_DATABASE_NAME')),
+                           **pool_options)
 elif os.environ.get('FLASK_CONFIG') == 'test':
     engine = create_engine('postgresql://{}:{}@{}/{}'.format(os.environ.get('TEST_DATABASE_USER'),
                                                              os.environ.get('TEST_DATABASE_PASSWORD'),
                                                              os.environ.get('TEST_DATABASE_HOST'),
-                                                             os.environ.get('TEST_DATABASE_NAME')))
+                                                             os.environ.get('TEST_DATABASE_NAME')),
+                           **pool_options)
 else:
     engine = create_engine('postgresql://{}:{}@{}/{}'.format(os.environ.get('DEV_DATABASE_USER'),
                                                              os.environ.get('DEV_DATABASE_PASSWORD'),
                                                              os.environ.get('DEV_DATABASE_HOST'),
-                                                             os.environ.get('DEV_DATABASE_NAME')))
+                                                             os.environ.get('DEV_DATABASE_NAME')),
+                           **pool_options)
+
+# plain sessions for background threads, which have to close them themselves
+session_factory = sessionmaker(bind=engine)
+
 
-Session = sessionmaker(bind=engine)
+def _session_scope():
+    # one session per app context, threads without one get a session per thread
+    ctx = _app_ctx_stack.top
+    return id(ctx) if ctx is not None else threading.get_ident()
+
+
+# request handlers share the session of their app context, which is removed once the app context is torn down
+Session = scoped_session(session_factory, scopefunc=_session_scope)
 
 Base = declarative_base()
 Base.metadata.create_all(engine)
 
 
+@lru_cache(maxsize=Config.SCHEMA_CACHE_SIZE)
+def _schema_instance(schema_class, many, only):
+    return schema_class(many=many, only=only)
+
+
+def cached_schema(schema_class, many=False, only=None):
+    """
+    shared schema instance per schema class, many and only, marshmallow binds all fields when a schema is created,
+    which costs more than dumping an entity with it
+    """
+    if isinstance(only, (list, tuple, set)):
+        only = frozenset(only)
+
+    return _schema_instance(schema_class, many, only)
+
+
+def schema_cache_stats():
+    """
+    Returns:
+        dict holding the number of cached schemas, hits and misses
+    """
+    info = _schema_instance.cache_info()
+
+    return {'size': info.currsize, 'hits': info.hits, 'misses': info.misses}
+
+
+def pool_stats():
+    """
+    Returns:
+        dict holding the connection pool metrics, empty if the engine does not use a TimedQueuePool
+    """
+    return engine.pool.stats() if isinstance(engine.pool, TimedQueuePool) else {}
+
+
 class Entity:
     id = Column(Integer, primary_key=True, autoincrement=True)
     created_at = Column(DateTime, nullable=False)
@@ -60,6 +174,14 @@ class Entity:
 
         return act
 
+    @staticmethod
+    def get_enrichments():
+        """
+        :return: dict mapping the enrich methods a specification may request to the attributes of the related entity,
+        None if the method ignores the requested attribute
+        """
+        return {}
+
 
 class EntitySchema(Schema):
     id = fields.Integer()
@@ -5,7 +5,7 @@ from marshmallow import fields
 from sqlalchemy import Column, Integer, ForeignKey
 from sqlalchemy.orm import relationship
 
-from app.entities.entity import Entity, Base, EntitySchema
+from app.entities.entity import Entity, Base, EntitySchema, cached_schema
 
 
 class HikeRelation(Entity, Base):
@@ -33,16 +33,16 @@ class HikeRelation(Entity, Base):
         session.commit()
 
     def convert_to_insert_schema(self):
-        schema = HikeRelationSchema()
+        schema = cached_schema(HikeRelationSchema)
         return schema.dump(self)
 
     @staticmethod
     def get_insert_schema():
-        return HikeRelationSchema()
+        return cached_schema(HikeRelationSchema)
 
     @staticmethod
     def get_schema(many, only):
-        return HikeRelationSchema(many=many, only=only)
+        return cached_schema(HikeRelationSchema, many=many, only=only)
 
     @staticmethod
     def get_attributes():
@@ -1,16 +1,22 @@
 # coding=utf-8
 
-from sqlalchemy import Column, String, ForeignKey, Integer, Float
+from sqlalchemy import Column, String, ForeignKey, Integer, Float, Index, func
 from marshmallow import Schema, fields
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from enum import Enum
 
-from app.entities.entity import Entity, Base, EntitySchema
+from app.entities.entity import Entity, Base, EntitySchema, cached_schema
+from app.utils.helpers import EARTH_RADIUS
+from app.utils.autocomplete import name_index
+from app.utils.spatial_index import location_index
 
 
 class Location(Entity, Base):
     __tablename__ = 'locations'
+    __table_args__ = (Index('ix_locations_lat_long', 'lat', 'long'),
+                      Index('ix_locations_name_trgm', 'name', postgresql_using='gin',
+                            postgresql_ops={'name': 'gin_trgm_ops'}))
 
     lat = Column(Float, nullable=False)
     long = Column(Float, nullable=False)
@@ -35,6 +41,8 @@ class Location(Entity, Base):
 
         session.add(self)
         session.commit()
+        name_index.update(self.__class__.__name__, self.id, self.name)
+        location_index.update(self.id, self.lat, self.long)
 
         return self
 
@@ -48,9 +56,11 @@ class Location(Entity, Base):
 
         session.add(self)
         session.commit()
+        name_index.update(self.__class__.__name__, self.id, self.name)
+        location_index.update(self.id, self.lat, self.long)
 
     def convert_to_insert_schema(self):
-        schema = LocationInsertSchema()
+        schema = cached_schema(LocationInsertSchema)
         return schema.dump(self)
 
     def get_country(self, output='id'):
@@ -59,13 +69,24 @@ class Location(Entity, Base):
     def get_region(self, output='id'):
         return getattr(self.region, output)
 
+    @staticmethod
+    def distance_expression(lat, long):
+        """
+        SQL expression of the Haversine distance in km between the location and the given coordinates
+        """
+        left_form = func.power(func.sin(func.radians(Location.lat - lat) / 2), 2)
+        right_form = func.cos(func.radians(lat)) * func.cos(func.radians(Location.lat)) * \
+            func.power(func.sin(func.radians(Location.long - long) / 2), 2)
+
+        return 2 * EARTH_RADIUS * func.asin(func.least(func.sqrt(left_form + right_form), 1))
+
     @staticmethod
     def get_insert_schema():
-        return LocationInsertSchema()
+        return cached_schema(LocationInsertSchema)
 
     @staticmethod
     def get_schema(many, only):
-        return LocationSchema(many=many, only=only)
+        return cached_schema(LocationSchema, many=many, only=only)
 
     @staticmethod
     def get_attributes():
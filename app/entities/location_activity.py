@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from datetime import datetime
 from enum import Enum
 
-from app.entities.entity import Entity, Base, EntitySchema
+from app.entities.entity import Entity, Base, EntitySchema, cached_schema
 
 
 class LocationActivity(Entity, Base):
@@ -43,16 +43,16 @@ class LocationActivity(Entity, Base):
         session.commit()
 
     def convert_to_insert_schema(self):
-        schema = LocationActivityInsertSchema()
+        schema = cached_schema(LocationActivityInsertSchema)
         return schema.dump(self)
 
     @staticmethod
     def get_insert_schema():
-        return LocationActivityInsertSchema()
+        return cached_schema(LocationActivityInsertSchema)
 
     @staticmethod
     def get_schema(many, only):
-        return LocationActivitySchema(many=many, only=only)
+        return cached_schema(LocationActivitySchema, many=many, only=only)
 
     @staticmethod
     def get_attributes():
@@ -1,15 +1,17 @@
 # coding=utf-8
 
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
 from marshmallow import Schema, fields
 from datetime import datetime
 from enum import Enum
 
-from app.entities.entity import Entity, Base, EntitySchema
+from app.entities.entity import Entity, Base, EntitySchema, cached_schema
 
 
 class LocationType(Entity, Base):
     __tablename__ = 'location_types'
+    __table_args__ = (Index('ix_location_types_name_trgm', 'name', postgresql_using='gin',
+                            postgresql_ops={'name': 'gin_trgm_ops'}),)
 
     name = Column(String, nullable=False)
     last_updated_by = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -38,16 +40,16 @@ class LocationType(Entity, Base):
         session.commit()
 
     def convert_to_insert_schema(self):
-        schema = LocationTypeInsertSchema()
+        schema = cached_schema(LocationTypeInsertSchema)
         return schema.dump(self)
 
     @staticmethod
     def get_insert_schema():
-        return LocationTypeInsertSchema()
+        return cached_schema(LocationTypeInsertSchema)
 
     @staticmethod
     def get_schema(many, only):
-        return LocationTypeSchema(many=many, only=only)
+        return cached_schema(LocationTypeSchema, many=many, only=only)
 
     @staticmethod
     def get_attributes():
@@ -0,0 +1,50 @@
+# coding=utf-8
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from app.entities.entity import Entity, Base
+
+
+class OutboxStatus:
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+
+class OutboxMessage(Entity, Base):
+    """
+    email waiting to be sent by the background sender, rows are kept after sending for inspection
+    """
+    __tablename__ = 'email-outbox'
+    __table_args__ = (Index('ix_email_outbox_pending', 'status', 'next_attempt_at'),)
+
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body_text = Column(Text, nullable=False)
+    body_html = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, default=OutboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    sent_at = Column(DateTime)
+    last_error = Column(String)
+
+    def __init__(self, recipient, subject, body_text, body_html):
+        Entity.__init__(self)
+        self.recipient = recipient
+        self.subject = subject
+        self.body_text = body_text
+        self.body_html = body_html
+        self.status = OutboxStatus.PENDING
+        self.attempts = 0
+        self.next_attempt_at = datetime.now()
+
+    def __repr__(self):
+        return '<OutboxMessage %r>' % self.id
+
+    def create(self, session):
+
+        session.add(self)
+        session.commit()
+
+        return self
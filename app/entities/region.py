@@ -1,16 +1,19 @@
 # coding=utf-8
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
 from marshmallow import Schema, fields
 from sqlalchemy.orm import relationship
 from enum import Enum
 
 from app.entities.country import Country
-from app.entities.entity import Entity, EntitySchema, Base
+from app.entities.entity import Entity, EntitySchema, Base, cached_schema
+from app.utils.autocomplete import name_index
 
 
 class Region(Entity, Base):
     __tablename__ = 'regions'
+    __table_args__ = (Index('ix_regions_name_trgm', 'name', postgresql_using='gin',
+                            postgresql_ops={'name': 'gin_trgm_ops'}),)
 
     name = Column(String, nullable=False)
     country_id = Column(Integer, ForeignKey('countries.id'), nullable=False)
@@ -26,6 +29,7 @@ class Region(Entity, Base):
     def create(self, session):
         session.add(self)
         session.commit()
+        name_index.update(self.__class__.__name__, self.id, self.name)
 
         return self
 
@@ -39,9 +43,10 @@ class Region(Entity, Base):
 
         session.add(self)
         session.commit()
+        name_index.update(self.__class__.__name__, self.id, self.name)
 
     def convert_to_insert_schema(self):
-        schema = RegionInsertSchema()
+        schema = cached_schema(RegionInsertSchema)
         return schema.dump(self)
 
     def get_country(self, output='id'):
@@ -49,11 +54,11 @@ class Region(Entity, Base):
 
     @staticmethod
     def get_insert_schema():
-        return RegionInsertSchema()
+        return cached_schema(RegionInsertSchema)
 
     @staticmethod
     def get_schema(many, only):
-        return RegionSchema(many=many, only=only)
+        return cached_schema(RegionSchema, many=many, only=only)
 
     @staticmethod
     def get_attributes():
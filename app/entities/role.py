@@ -1,9 +1,13 @@
+import threading
+import time
+
 from marshmallow import fields
 from sqlalchemy import Column, String, Boolean, Integer
 from sqlalchemy.orm import relationship
 from enum import Enum
 
-from app.entities.entity import Entity, EntitySchema, Base
+from app.entities.entity import Entity, EntitySchema, Base, session_factory
+from config import Config
 
 
 class Role(Entity, Base):
@@ -27,13 +31,16 @@ class Role(Entity, Base):
     def add_permission(self, perm):
         if not self.has_permission(perm):
             self.permissions += perm
+            role_table.invalidate()
 
     def rem_permission(self, perm):
         if not self.has_permission(perm):
             self.permissions -= perm
+            role_table.invalidate()
 
     def reset_permissions(self):
         self.permissions = 0
+        role_table.invalidate()
 
     def has_permission(self, perm):
         return self.permissions & perm == perm
@@ -62,6 +69,8 @@ class Role(Entity, Base):
             session.add(role)
         session.commit()
 
+        role_table.load(session)
+
 
 class RoleSchema(EntitySchema):
     name = fields.String()
@@ -78,6 +87,69 @@ class Permission:
     ADMIN = 32
 
 
+class RoleTable:
+    """
+    process-level copy of the permissions of all roles, so that permission checks need no database access,
+    the few rows are reloaded as a whole after ttl seconds to pick up changes made by other processes, unknown
+    roles trigger one reload and are then answered without permissions until the next scheduled reload
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._permissions = {}
+        self._unknown = set()
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, session):
+        """
+        replaces the table by the roles stored in the database, is called whenever roles are changed
+        :param session: database session
+        """
+        permissions = {r.id: r.permissions or 0 for r in session.query(Role.id, Role.permissions)}
+
+        with self._lock:
+            self._permissions = permissions
+            self._unknown = set()
+            self._expires = time.monotonic() + self.ttl
+
+    def invalidate(self):
+        """
+        reloads the table on the next permission check, is called whenever the permissions of a role are changed
+        """
+        with self._lock:
+            self._expires = 0.0
+
+    def _reload(self):
+        session = session_factory()
+        try:
+            self.load(session)
+        finally:
+            session.close()
+
+    def permissions(self, role_id):
+        """
+        :param role_id: id of the role
+        :return: permission bitmask of the role, 0 for unknown roles
+        """
+        if self._expires < time.monotonic():
+            self._reload()
+        elif role_id is not None and role_id not in self._permissions and role_id not in self._unknown:
+            # the role may have been created by another process since the last load
+            self._reload()
+            if role_id not in self._permissions:
+                with self._lock:
+                    self._unknown.add(role_id)
+
+        return self._permissions.get(role_id, 0)
+
+    def has_permission(self, role_id, perm):
+        return self.permissions(role_id) & perm == perm
+
+
+role_table = RoleTable(ttl=Config.ROLE_CACHE_TTL)
+
+
 class RoleAttributes(Enum):
     NAME = 'name'
     DEFAULT = 'default'
@@ -1,6 +1,5 @@
 from marshmallow import fields, Schema
 from sqlalchemy.orm import relationship, backref
-from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import Column, String, Integer, Boolean, ForeignKey
 from itsdangerous import TimedJSONWebSignatureSerializer
 from flask import current_app
@@ -8,9 +7,11 @@ from datetime import datetime
 from enum import Enum
 
 from app.entities.comment import Comment
-from app.entities.entity import Entity, EntitySchema, Base
+from app.entities.entity import Entity, EntitySchema, Base, cached_schema
 from app.entities.hike_relations import HikeRelation
-from app.entities.role import Permission
+from app.entities.role import Permission, role_table
+from app.utils.auth_cache import get_serializer, token_cache
+from app.utils.hashing import check_password, hash_password
 from app.utils.helpers import rand_alphanumeric
 
 
@@ -31,7 +32,7 @@ class User(Entity, Base):
         Entity.__init__(self)
         self.username = username
         self.email = email
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password, current_app.config['PASSWORD_HASH_ITERATIONS'])
         self.role_id = role_id
         self.session_id = rand_alphanumeric()
         self.last_updated_by = created_by
@@ -59,11 +60,11 @@ class User(Entity, Base):
         session.commit()
 
     def update_password(self, password, session, updated_by):
-        self.password_hash = generate_password_hash(password)
-        self.update(session, updated_by=updated_by)
+        self.password_hash = hash_password(password, current_app.config['PASSWORD_HASH_ITERATIONS'])
+        self.revoke_auth_tokens(session, updated_by)
 
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return check_password(self.password_hash, password)
 
     def confirm(self, session):
 
@@ -142,15 +143,28 @@ class User(Entity, Base):
         return True
 
     def can(self, perm):
-        return self.role is not None and self.role.has_permission(perm)
+        return role_table.has_permission(self.role_id, perm)
 
     def is_admin(self):
         return self.can(Permission.ADMIN)
 
-    def generate_auth_token(self, expiration, session):
+    def revoke_auth_tokens(self, session, updated_by):
+        """
+        invalidates all auth tokens of the user by issuing a new session id
+        """
         self.session_id = rand_alphanumeric()
-        self.update(session, self.session_id)
-        s = TimedJSONWebSignatureSerializer(current_app.config['SECRET_KEY'], expires_in=expiration)
+        self.update(session, updated_by)
+        token_cache.invalidate_user(self.id)
+
+    def generate_auth_token(self, expiration, session):
+        s = get_serializer(current_app.config['SECRET_KEY'], expires_in=expiration)
+
+        # stateless tokens carry the user id and the current session id, which only changes on logout or password
+        # change, so that issuing a token does not write the users table
+        if current_app.config['AUTH_TOKEN_MODE'] == 'stateless':
+            return s.dumps({'uid': self.id, 'session_id': self.session_id}).decode('utf-8')
+
+        self.revoke_auth_tokens(session, self.session_id)
         return s.dumps({'session_id': self.session_id}).decode('utf-8')
 
     @staticmethod
@@ -187,16 +201,28 @@ class User(Entity, Base):
 
     @staticmethod
     def verify_auth_token(token, session):
-        s = TimedJSONWebSignatureSerializer(current_app.config['SECRET_KEY'])
+        """
+        returns the user of an auth token together with the expiration of the token as UNIX timestamp,
+        (None, None) if the token is invalid or expired
+        """
+        s = get_serializer(current_app.config['SECRET_KEY'])
         try:
-            data = s.loads(token)
+            data, header = s.loads(token, return_header=True)
         except:
-            return None
-        return session.query(User).filter(User.session_id == data['session_id']).first()
+            return None, None
+
+        if 'uid' in data:
+            user = session.query(User).get(data['uid'])
+            if user is None or user.session_id != data['session_id']:
+                user = None
+        else:
+            user = session.query(User).filter(User.session_id == data['session_id']).first()
+
+        return user, header.get('exp') if user is not None else None
 
     @staticmethod
     def get_schema(many, only):
-        return UserSchema(many=many, only=only)
+        return cached_schema(UserSchema, many=many, only=only)
 
 
 class UserInsertSchema(Schema):
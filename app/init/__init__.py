@@ -2,13 +2,14 @@ import ast
 import base64
 
 import pandas as pd
+import sqlalchemy as sql
 import xlrd
 
 from flask import Blueprint
 
 from app.auth import http_auth
 from app.entities.Statistic import Statistic
-from app.entities.activity import Activity
+from app.entities.activity import Activity, SEARCH_VECTOR
 from app.entities.activity_type import ActivityType
 from app.entities.country import Country
 from app.entities.entity import Session, Base, engine
@@ -17,7 +18,7 @@ from app.entities.location_activity import LocationActivity
 from app.entities.location_type import LocationType
 from app.entities.region import Region
 from app.entities.role import Permission, Role
-from app.entities.user import User
+from app.main import build_location_index, build_name_index, tour_cache
 from app.utils import responses
 from app.utils.helpers import intersection
 from app.utils.responses import create_response, ResponseMessages
@@ -25,11 +26,41 @@ from app.utils.responses import create_response, ResponseMessages
 init = Blueprint('init', __name__)
 
 
+def add_search_vector():
+    """
+    create_all does not alter existing tables, databases created before the full text search get the search_vector
+    column of activities here, its GIN index is created by create_missing_indexes
+    """
+    existing = {column['name'] for column in sql.inspect(engine).get_columns(Activity.__tablename__)}
+
+    if 'search_vector' not in existing:
+        engine.execute('ALTER TABLE {} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({}) STORED'
+                       .format(Activity.__tablename__, SEARCH_VECTOR))
+
+
+def create_missing_indexes():
+    """
+    create_all only creates indexes together with their table, indexes declared later for an existing table are
+    created here
+    """
+    inspector = sql.inspect(engine)
+
+    for table in Base.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+
+
 def init_db():
 
     session = Session()
 
+    # trigram operator classes of the name indexes
+    engine.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
     Base.metadata.create_all(engine)
+    add_search_vector()
+    create_missing_indexes()
     Role.insert_roles(session)
 
     # check whether Statistic instance exists
@@ -38,6 +69,9 @@ def init_db():
     except RuntimeError:
         Statistic().create(session)
 
+    build_location_index(session)
+    build_name_index(session)
+
     session.expunge_all()
     session.close()
 
@@ -57,9 +91,6 @@ def import_tours(data_encoded):
         res = session.query(c).order_by(c.id.desc()).first()
         last_index.update({c.__name__: res.id if res is not None else 0})
 
-    if user not in session:
-        user = session.query(User).get(user.id)
-
     if user is not None and user.can(Permission.ADMIN):
 
         PATH_FILE = data.get('path_file')
@@ -232,6 +263,11 @@ def import_tours(data_encoded):
             session.add_all(mappings)
             session.commit()
 
+            # bulk inserts bypass the create methods, so the indexes are reloaded and cached results are dropped
+            build_location_index(session)
+            build_name_index(session)
+            tour_cache.clear()
+
             session.expunge_all()
             session.close()
 
@@ -1,39 +1,65 @@
-import ast
-import base64
+import heapq
+import math
 import os
 from pathlib import Path
 from threading import Thread
 
 import boto3
+import numpy as np
 import sqlalchemy as sql
 
-from flask import Blueprint, request as rq, send_file
+from flask import Blueprint, current_app, request as rq, send_file
 from sqlalchemy import or_
 
 from app.auth import http_auth
 from app.entities.Statistic import Statistic
-from app.entities.entity import Session
+from app.entities.entity import Session, session_factory
 from app.entities.hike_relations import HikeRelation
 from app.entities.user import Permission, User
-from app.entities.country import Country
 from app.entities.region import Region
-from app.entities.activity_type import ActivityType
 from app.entities.location_activity import LocationActivity
 from app.entities.activity import Activity
-from app.entities.location import Location, LocationAttributes
+from app.entities.country import Country
+from app.entities.enrichment import serialize_activities
+from app.entities.location import Location
 from app.main.error_handling import investigate_integrity_error
 from app.utils import responses
 from app.utils.responses import ResponseMessages, create_response
-from app.utils.helpers import distance_between_coordinates, sort_by_dist
+from app.utils.autocomplete import name_index
+from app.utils.cache import ResultCache
+from app.utils.projection import cached_projection
+from app.utils.request_spec import bounded, InvalidRequestSpec, parse_spec
+from app.utils.search import fuzzy_filter
+from app.utils.helpers import bounding_box, decode_cursor, deg_to_radian, distance_between_coordinates, \
+    distances_between_coordinates, distances_to_segment, encode_cursor, EARTH_RADIUS
+from app.utils.spatial_index import location_index, to_cartesian
 from config import Config
 
 main = Blueprint('main', __name__)
 
+# results of find_tour, keyed by geo cell (coordinates rounded to 3 decimals), distance and requested output
+tour_cache = ResultCache(max_size=Config.TOUR_CACHE_SIZE, ttl=Config.TOUR_CACHE_TTL)
+
+# in km, half the circumference of the earth
+MAX_DISTANCE = math.pi * EARTH_RADIUS
+
+# cursor of the searches ranked by distance: (distance, name) of the last activity of a page
+DISTANCE_CURSOR = ((int, float), str)
+
+# entities whose names are completed by the autocompletion
+AUTOCOMPLETE_CLASSES = [Activity, Location, Region, Country]
+
 
 def get_main_app():
     return main
 
 
+@main.app_errorhandler(InvalidRequestSpec)
+def invalid_request_spec(e):
+    return create_response(str(e), responses.INVALID_INPUT_422, ResponseMessages.REQUEST_INVALID_SPEC, e.class_name,
+                           422)
+
+
 def check_integrity_error(ie, session, class_type):
     session.rollback()
     session.expunge_all()
@@ -53,9 +79,6 @@ def count(user, class_type, **kwargs):
     session = Session()
     res = None
 
-    if user not in session:
-        user = session.query(User).get(user.id)
-
     if user is not None and user.can(Permission.READ):
 
         count = session.query(class_type).filter_by(**kwargs).count()
@@ -66,93 +89,589 @@ def count(user, class_type, **kwargs):
         return create_response(res, responses.UNAUTHORIZED_403, ResponseMessages.FIND_NOT_AUTHORIZED, class_type, 403)
 
 
+def location_table_state(session):
+    """
+    Args:
+        session: database session
+
+    Returns:
+        number of locations and the latest change, differs from the state of the location index once another
+        process has created, moved or deleted a location
+    """
+    return tuple(session.query(sql.func.count(Location.id), sql.func.max(Location.updated_at)).one())
+
+
+def build_location_index(session):
+    """
+    loads the coordinates of all locations into the spatial index
+    Args:
+        session: database session
+    """
+    state = location_table_state(session)
+    location_index.build(session.query(Location.id, Location.lat, Location.long), state)
+
+
+def refresh_location_index(session):
+    """
+    builds the spatial index on first use and rebuilds it if the locations table has changed since, the table is
+    probed at most once per LOCATION_INDEX_CHECK_INTERVAL, the cached results of find_tour are dropped on a rebuild
+    since they may hold the changed locations
+    Args:
+        session: database session
+    """
+    if location_index.claim_check() and location_table_state(session) != location_index.state:
+        build_location_index(session)
+        tour_cache.clear()
+
+
+def locations_in_range(session, lat, long, max_dist):
+    """
+    determines all locations closer than max_dist to the given coordinates
+    Args:
+        session: database session
+        lat: latitude of the reference point
+        long: longitude of the reference point
+        max_dist: maximum distance in km
+
+    Returns:
+        dict mapping location id to exact distance in km, ordered by distance
+    """
+    if current_app.config['FIND_TOUR_MODE'] == 'table':
+        lat_min, lat_max, long_ranges = bounding_box(lat, long, max_dist)
+        records = session.query(Location.id, Location.lat, Location.long) \
+            .filter(Location.lat.between(lat_min, lat_max),
+                    or_(*[Location.long.between(long_min, long_max) for long_min, long_max in long_ranges])) \
+            .all()
+        dists = distances_between_coordinates([r.lat for r in records], [r.long for r in records], lat, long,
+                                              rounded=False)
+        distances = sorted(zip([r.id for r in records], dists.tolist()), key=lambda item: item[1])
+    else:
+        refresh_location_index(session)
+        distances = location_index.query_radius(lat, long, max_dist)
+
+    return dict((loc_id, dist) for loc_id, dist in distances if math.ceil(dist) < max_dist)
+
+
+def activity_links(session, location_ids):
+    """
+    fetches the links between activities and the given locations without loading the activities
+    Args:
+        session: database session
+        location_ids: ids of the locations
+
+    Returns:
+        list of tuples (activity id, location id, activity name)
+    """
+    return session.query(LocationActivity.activity_id, LocationActivity.location_id, Activity.name) \
+        .join(Activity, Activity.id == LocationActivity.activity_id) \
+        .filter(LocationActivity.location_id.in_(location_ids)) \
+        .all()
+
+
+def rank_links(links, locations, limit=None, cursor=None):
+    """
+    ranks activities by the distance of their closest location, only the closest activity per name is kept
+    Args:
+        links: list of tuples (activity id, location id, activity name), see :func:`~activity_links`
+        locations: dict mapping location id to distance, links to other locations are ignored
+        limit: maximum number of activities, all if None
+        cursor: (distance, name) of the last activity of the previous page
+
+    Returns:
+        list of tuples (distance, activity name, activity id), ordered by distance
+    """
+    closest = {}
+    for activity_id, location_id, name in links:
+        if location_id not in locations:
+            continue
+        item = (locations[location_id], name, activity_id)
+        if name not in closest or item < closest[name]:
+            closest[name] = item
+
+    candidates = closest.values()
+    if cursor is not None:
+        candidates = [item for item in candidates if item[:2] > tuple(cursor)]
+
+    if limit is None:
+        return sorted(candidates)
+
+    return heapq.nsmallest(limit, candidates)
+
+
+def rank_activities(session, locations, limit=None, cursor=None):
+    """
+    ranks the activities linked to the given locations by distance without loading them, only the closest activity
+    per name is kept
+    Args:
+        session: database session
+        locations: dict mapping location id to distance
+        limit: maximum number of activities, all if None
+        cursor: (distance, name) of the last activity of the previous page
+
+    Returns:
+        list of tuples (distance, activity name, activity id), ordered by distance
+    """
+    return rank_links(activity_links(session, locations.keys()), locations, limit=limit, cursor=cursor)
+
+
+def rank_activities_sql(session, lat, long, max_dist, limit=None, cursor=None):
+    """
+    database side variant of :func:`~rank_activities`, distances are computed, filtered, ordered and limited by
+    the database, so out of range locations never leave it
+    Args:
+        session: database session
+        lat: latitude of the reference point
+        long: longitude of the reference point
+        max_dist: maximum distance in km
+        limit: maximum number of activities, all if None
+        cursor: (distance, name) of the last activity of the previous page
+
+    Returns:
+        list of tuples (distance, activity name, activity id), ordered by distance, and dict mapping the ids of the
+        closest locations of these activities to their distance
+    """
+    dist = Location.distance_expression(lat, long)
+    lat_min, lat_max, long_ranges = bounding_box(lat, long, max_dist)
+
+    # closest location per activity name
+    closest = session.query(dist.label('dist'), Activity.name.label('name'), Activity.id.label('activity_id'),
+                            Location.id.label('location_id')) \
+        .select_from(Location) \
+        .join(LocationActivity, LocationActivity.location_id == Location.id) \
+        .join(Activity, Activity.id == LocationActivity.activity_id) \
+        .filter(Location.lat.between(lat_min, lat_max),
+                or_(*[Location.long.between(long_min, long_max) for long_min, long_max in long_ranges]),
+                sql.func.ceil(dist) < max_dist) \
+        .distinct(Activity.name) \
+        .order_by(Activity.name, dist, Activity.id) \
+        .subquery()
+
+    query = session.query(closest).order_by(closest.c.dist, closest.c.name, closest.c.activity_id)
+    if cursor is not None:
+        query = query.filter(sql.tuple_(closest.c.dist, closest.c.name) > sql.tuple_(cursor[0], cursor[1]))
+    if limit is not None:
+        query = query.limit(limit)
+
+    rows = query.all()
+
+    return [(r.dist, r.name, r.activity_id) for r in rows], dict((r.location_id, r.dist) for r in rows)
+
+
+def fetch_activity_locations(session, location_ids, activity_ids):
+    """
+    fetches activities together with the names of their linked locations and regions in a single query
+    Args:
+        session: database session
+        location_ids: restricts the linked locations to these locations
+        activity_ids: ids of the activities
+
+    Returns:
+        list of tuples (activity, location id, location name, region name)
+    """
+    return session.query(Activity, LocationActivity.location_id, Location.name.label('location_name'),
+                         Region.name.label('region_name')) \
+        .join(LocationActivity, LocationActivity.activity_id == Activity.id) \
+        .join(Location, Location.id == LocationActivity.location_id) \
+        .join(Region, Region.id == Location.region_id) \
+        .filter(LocationActivity.location_id.in_(location_ids),
+                Activity.id.in_(activity_ids)) \
+        .all()
+
+
+def activities_at_locations(rows, locations):
+    """
+    picks the closest linked location of every activity
+    Args:
+        rows: list of tuples (activity, location id, location name, region name),
+            see :func:`~fetch_activity_locations`
+        locations: dict mapping location id to distance, other locations are ignored
+
+    Returns:
+        list of tuples (activity, location id, location name, region name, distance), ordered by distance
+    """
+    closest = {}
+    for activity, location_id, location_name, region_name in rows:
+        if location_id not in locations:
+            continue
+        dist = locations[location_id]
+        if activity.id not in closest or dist < closest[activity.id][4]:
+            closest[activity.id] = (activity, location_id, location_name, region_name, dist)
+
+    return sorted(closest.values(), key=lambda item: item[4])
+
+
+def serialize_page(session, locations, page, output, tags=None, rows=None):
+    """
+    loads and serializes the activities of a ranked page, together with the name of their closest location, its
+    region and the ceiled distance
+    Args:
+        session: database session
+        locations: dict mapping location id to distance
+        page: list of tuples (distance, activity name, activity id)
+        output: attributes of the activities to serialize
+        tags: optional dict mapping location id to further attributes of the activities found there
+        rows: activities fetched beforehand by :func:`~fetch_activity_locations`, fetched for the page if None
+
+    Returns:
+        list of serialized activities in the order of the page
+    """
+    if rows is None:
+        rows = fetch_activity_locations(session, locations.keys(), [item[2] for item in page])
+
+    records = dict((a.id, (a, location_id, location_name, region_name))
+                   for a, location_id, location_name, region_name, _ in activities_at_locations(rows, locations))
+
+    activities = []
+    for dist, _, activity_id in page:
+        a, location_id, location_name, region_name = records[activity_id]
+        attributes = {'location': location_name, 'region': region_name, 'distance': math.ceil(dist)}
+        if tags is not None:
+            attributes.update(tags.get(location_id, {}))
+        activities.append(a.serialize(only=output, session=session, **attributes))
+
+    return activities
+
+
+def next_page_cursor(page, limit):
+    """
+    Returns:
+        cursor pointing behind the last activity of a ranked page, None if there is no further page
+    """
+    if limit is not None and len(page) == limit:
+        return encode_cursor([page[-1][0], page[-1][1]])
+
+    return None
+
+
+def locations_along_route(session, waypoints, width):
+    """
+    determines all locations within a corridor along a route, the candidates of all route segments are collected
+    from the spatial index and checked against the whole route at once
+    Args:
+        session: database session
+        waypoints: list of (lat, long) describing the route
+        width: maximum distance from the route in km
+
+    Returns:
+        dict mapping location id to distance from the route in km, ordered by distance, and dict mapping location id
+        to the index of the closest waypoint
+    """
+    refresh_location_index(session)
+
+    segments = [(waypoints[i], waypoints[i + 1]) for i in range(len(waypoints) - 1)] or [(waypoints[0], waypoints[0])]
+
+    candidates = set()
+    for start, end in segments:
+        # ball around the center of the segment covering the whole corridor of the segment
+        center = to_cartesian(start[0], start[1]) + to_cartesian(end[0], end[1])
+        center_lat = deg_to_radian(math.atan2(center[2], math.hypot(center[0], center[1])), backwards=True)
+        center_long = deg_to_radian(math.atan2(center[1], center[0]), backwards=True)
+        radius = distance_between_coordinates(start[0], start[1], end[0], end[1], rounded=False) / 2 + width
+        candidates.update(loc_id for loc_id, _ in location_index.query_radius(center_lat, center_long, radius))
+
+    if not candidates:
+        return {}, {}
+
+    ids = sorted(candidates)
+    lats, longs = location_index.coordinates(ids)
+    route_dists = np.min([distances_to_segment(lats, longs, start, end) for start, end in segments], axis=0)
+    closest_waypoints = np.argmin(distances_between_coordinates(lats, longs,
+                                                                [w[0] for w in waypoints], [w[1] for w in waypoints],
+                                                                rounded=False), axis=0)
+
+    in_corridor = sorted((dist, loc_id, int(wp))
+                         for loc_id, dist, wp in zip(ids, route_dists.tolist(), closest_waypoints.tolist())
+                         if dist <= width)
+
+    return dict((loc_id, dist) for dist, loc_id, _ in in_corridor), dict((loc_id, wp) for _, loc_id, wp in in_corridor)
+
+
+def search_tours_batch(session, queries, output, limit=None):
+    """
+    answers several searches at once, the candidates of all searches are collected from the spatial index and
+    their activities fetched together, distances are computed as one matrix
+    Args:
+        session: database session
+        queries: list of (lat, long, max_dist)
+        output: attributes of the activities to serialize
+        limit: maximum number of activities per search, all if None
+
+    Returns:
+        list of serialized activities per search
+    """
+    refresh_location_index(session)
+
+    candidates = set()
+    for lat, long, max_dist in queries:
+        candidates.update(loc_id for loc_id, _ in location_index.query_radius(lat, long, max_dist))
+
+    if not candidates:
+        return [[] for _ in queries]
+
+    ids = sorted(candidates)
+    lats, longs = location_index.coordinates(ids)
+    dists = distances_between_coordinates(lats, longs, [q[0] for q in queries], [q[1] for q in queries],
+                                          rounded=False)
+    links = activity_links(session, ids)
+
+    searches = []
+    for (_, _, max_dist), row in zip(queries, dists.tolist()):
+        locations = dict(sorted(((loc_id, dist) for loc_id, dist in zip(ids, row) if math.ceil(dist) < max_dist),
+                                key=lambda item: item[1]))
+        searches.append((locations, rank_links(links, locations, limit=limit)))
+
+    rows = fetch_activity_locations(session, ids, set(item[2] for _, page in searches for item in page))
+
+    return [serialize_page(session, locations, page, output, rows=rows) for locations, page in searches]
+
+
+def search_tours(session, lat, long, max_dist, output, limit=None, cursor=None):
+    """
+    searches the activities closest to the given coordinates
+    Args:
+        session: database session
+        lat: latitude of the reference point
+        long: longitude of the reference point
+        max_dist: maximum distance in km
+        output: attributes of the activities to serialize
+        limit: maximum number of activities, all if None
+        cursor: cursor returned for the previous page
+
+    Returns:
+        serialized activities and the cursor of the next page (None if there is no further page)
+    """
+    if cursor is not None:
+        cursor = decode_cursor(cursor)
+
+    if current_app.config['FIND_TOUR_MODE'] == 'sql':
+        page, locations = rank_activities_sql(session, lat, long, max_dist, limit=limit, cursor=cursor)
+    else:
+        locations = locations_in_range(session, lat, long, max_dist)
+        page = rank_activities(session, locations, limit=limit, cursor=cursor)
+
+    # only the activities of the requested page are loaded and serialized
+    return serialize_page(session, locations, page, output), next_page_cursor(page, limit)
+
+
+def name_table_state(session):
+    """
+    Args:
+        session: database session
+
+    Returns:
+        number of entries and the latest change of every table offered by the autocompletion, read with one query
+    """
+    return tuple(session.query(*[column
+                                 for class_type in AUTOCOMPLETE_CLASSES
+                                 for column in (session.query(sql.func.count(class_type.id)).as_scalar(),
+                                                session.query(sql.func.max(class_type.updated_at)).as_scalar())])
+                 .one())
+
+
+def build_name_index(session):
+    """
+    loads the names of all entities offered by the autocompletion into the prefix index
+    Args:
+        session: database session
+    """
+    state = name_table_state(session)
+    name_index.build(((class_type.__name__, r.id, r.name)
+                      for class_type in AUTOCOMPLETE_CLASSES
+                      for r in session.query(class_type.id, class_type.name)), state)
+
+
+def refresh_name_index(session):
+    """
+    builds the prefix index on first use and rebuilds it if one of its tables has changed since, e.g. by another
+    worker process, the tables are probed at most once per AUTOCOMPLETE_CHECK_INTERVAL
+    Args:
+        session: database session
+    """
+    if name_index.claim_check() and name_table_state(session) != name_index.state:
+        build_name_index(session)
+
+
 @main.route('/find_tour/<data_encoded>', methods=['GET'])
 @http_auth.login_required
 def find_tour(data_encoded):
     session = Session()
     user = http_auth.current_user
 
-    data_string = base64.b64decode(data_encoded).decode()
-    data = ast.literal_eval(data_string)
+    data = parse_spec(data_encoded, Activity, cursor_types=DISTANCE_CURSOR)
 
     curr_lat = round(float(data.get('lat')), 3)
     curr_long = round(float(data.get('long')), 3)
     max_dist = int(data.get('dist'))
 
-    if user not in session:
-        user = session.query(User).get(user.id)
-
     if user is not None and user.can(Permission.READ):
 
-        if curr_lat:
-            record_location = session.query(Location) \
-                .filter(Location.lat > curr_lat - 3 * max_dist / 100,
-                        Location.lat < curr_lat + 3 * max_dist / 100,
-                        Location.long > curr_long - 3 * max_dist / 100,
-                        Location.long < curr_long + 3 * max_dist / 100) \
-                .all()
-        else:
+        if not curr_lat:
             return create_response(None, responses.MISSING_PARAMETER_422, ResponseMessages.FIND_MISSING_PARAMETER,
                                    Location.__name__, 422)
 
-        schema = Location.get_schema(many=True, only=(str(LocationAttributes.NAME),
-                                                      str(LocationAttributes.LATITUDE),
-                                                      str(LocationAttributes.LONGITUDE),
-                                                      str(LocationAttributes.ID)))
-        locations = schema.dump(record_location)
+        if current_app.config['FIND_TOUR_MODE'] == 'index':
+            # location changes of other processes drop the cached results before they are served
+            refresh_location_index(session)
 
-        if record_location is None:
-            return create_response(None, responses.BAD_REQUEST_400, ResponseMessages.FIND_NO_RESULTS,
-                                   Activity.__name__, 400)
+        output = data.get('output')
+        cache_key = (curr_lat, curr_long, max_dist, tuple(output) if output is not None else None,
+                     data.get('limit'), data.get('cursor'))
+        cached = tour_cache.get(cache_key)
+
+        if cached is not None:
+            activities, next_cursor = cached
+        else:
+            activities, next_cursor = search_tours(session, curr_lat, curr_long, max_dist, output,
+                                                   limit=data.get('limit'), cursor=data.get('cursor'))
+            tour_cache.set(cache_key, (activities, next_cursor))
+
+        if len(activities) > 0:
+            resp = create_response(activities, responses.SUCCESS_200,
+                                   ResponseMessages.FIND_SUCCESS, Activity.__name__, 200)
+            if next_cursor is not None:
+                resp.headers['next_cursor'] = next_cursor
+            return resp
         else:
+            return create_response([], responses.BAD_REQUEST_400, ResponseMessages.FIND_NO_RESULTS,
+                                   Activity.__name__, 400)
 
-            for i, loc in enumerate(locations):
-                loc.update({"dist": distance_between_coordinates(loc["lat"], loc["long"],
-                                                                 curr_lat, curr_long)})
-            locations = [i for i in locations if i['dist'] < max_dist]
-            locations.sort(key=sort_by_dist)
-            locations = dict((item['id'], item) for item in locations)
+    else:
+        return create_response([], responses.UNAUTHORIZED_403, ResponseMessages.FIND_NOT_AUTHORIZED,
+                               Activity.__name__, 403)
 
-            record_activities = session.query(Activity) \
-                .join(ActivityType) \
-                .join(LocationActivity) \
-                .join(Location).join(Region) \
-                .join(Country) \
-                .filter(Location.id.in_(locations.keys())) \
-                .all()
 
-            activities = [a.serialize(only=data.get('output'), session=session,
-                                      **{
-                                          'location': [loc.location.name
-                                                       for loc in a.locations
-                                                       if locations.get(loc.location_id)][0],
-                                          'region': [loc.location.region.name
-                                                     for loc in a.locations
-                                                     if locations.get(loc.location_id)][0],
-                                          'distance': [locations.get(loc.location_id)['dist']
-                                                       for loc in a.locations
-                                                       if locations.get(loc.location_id)][0]
-                                      }
-                                      ) for a in record_activities]
-
-            activities = sorted(activities, key=lambda k: k['distance'])
-
-            # keep only one entry per activity
-            activity_names = set()
-            idx_to_keep = []
-            for idx, item in enumerate(activities):
-
-                if item["name"] not in activity_names:
-                    activity_names.add(item["name"])
-                    idx_to_keep.append(idx)
-
-            activities = [activities[i] for i in idx_to_keep]
-            if len(activities) > 0:
-                return create_response(activities, responses.SUCCESS_200,
-                                       ResponseMessages.FIND_SUCCESS, Activity.__name__, 200)
-            else:
-                return create_response([], responses.BAD_REQUEST_400, ResponseMessages.FIND_NO_RESULTS,
-                                       Activity.__name__, 400)
+def check_batch(data):
+    """
+    checks that a batch holds at most MAX_BATCH_QUERIES searches with valid coordinates and distances
+    Args:
+        data: decoded specification
+
+    Raises:
+        InvalidRequestSpec: if there are too many searches or a search is malformed
+    """
+    queries = data.get('queries') or []
+    max_queries = current_app.config['MAX_BATCH_QUERIES']
+    if len(queries) > max_queries:
+        raise InvalidRequestSpec('at most {} queries are allowed'.format(max_queries), Location)
+
+    for query in queries:
+        if not isinstance(query, dict):
+            raise InvalidRequestSpec('queries must hold lat, long and dist: {}'.format(query), Location)
+        bounded(query.get('lat'), 'lat', -90, 90)
+        bounded(query.get('long'), 'long', -180, 180)
+        bounded(query.get('dist'), 'dist', 0, MAX_DISTANCE)
+
+
+@main.route('/find_tour_batch/<data_encoded>', methods=['GET'])
+@http_auth.login_required
+def find_tour_batch(data_encoded):
+    """
+    Endpoint to answer several tour searches, e.g. around different bases of a trip, with one request
+    Args:
+        data_encoded: BASE64 encoded JSON with the searches as list of dicts with {lat}, {long} and {dist} in
+            {queries}, the attributes to return in {output} and optionally the maximum number of activities per
+            search in {limit}
+
+    Returns:
+        Flask response, consisting of one list of serialized activities per search, response code, response message,
+        affected class, and http code
+    """
+    session = Session()
+    user = http_auth.current_user
+
+    data = parse_spec(data_encoded, Activity, check=check_batch)
+
+    queries = [(round(float(q.get('lat')), 3), round(float(q.get('long')), 3), int(float(q.get('dist'))))
+               for q in data.get('queries') or []]
+
+    if user is not None and user.can(Permission.READ):
+
+        if len(queries) == 0:
+            return create_response(None, responses.MISSING_PARAMETER_422, ResponseMessages.FIND_MISSING_PARAMETER,
+                                   Location.__name__, 422)
+
+        results = search_tours_batch(session, queries, data.get('output'), limit=data.get('limit'))
+
+        return create_response(results, responses.SUCCESS_200, ResponseMessages.FIND_SUCCESS, Activity.__name__, 200)
+
+    else:
+        return create_response([], responses.UNAUTHORIZED_403, ResponseMessages.FIND_NOT_AUTHORIZED,
+                               Activity.__name__, 403)
+
+
+def check_corridor(data):
+    """
+    checks the waypoints and the width of a corridor search against CORRIDOR_MAX_WAYPOINTS and CORRIDOR_MAX_WIDTH
+    Args:
+        data: decoded specification
+
+    Raises:
+        InvalidRequestSpec: if there are too many waypoints, a waypoint is no valid coordinate or the width is out of
+            range
+    """
+    waypoints = data.get('waypoints') or []
+    max_waypoints = current_app.config['CORRIDOR_MAX_WAYPOINTS']
+    if len(waypoints) > max_waypoints:
+        raise InvalidRequestSpec('at most {} waypoints are allowed'.format(max_waypoints), Location)
+
+    for waypoint in waypoints:
+        if len(waypoint) != 2:
+            raise InvalidRequestSpec('waypoints must be (lat, long): {}'.format(waypoint), Location)
+        bounded(waypoint[0], 'lat', -90, 90)
+        bounded(waypoint[1], 'long', -180, 180)
+
+    if data.get('width') is not None:
+        bounded(data.get('width'), 'width', 0, current_app.config['CORRIDOR_MAX_WIDTH'])
+
+
+@main.route('/find_tour_corridor/<data_encoded>', methods=['GET'])
+@http_auth.login_required
+def find_tour_corridor(data_encoded):
+    """
+    Endpoint to find tours along a route, e.g. a planned drive
+    Args:
+        data_encoded: BASE64 encoded JSON with the route as list of (lat, long) in {waypoints}, the attributes to
+            return in {output} and optionally the maximum distance from the route in km in {width}, {limit} and
+            {cursor}
+
+    Returns:
+        Flask response, consisting of the serialized activities, each tagged with the index of the closest
+        waypoint, response code, response message, affected class, and http code
+    """
+    session = Session()
+    user = http_auth.current_user
+
+    data = parse_spec(data_encoded, Activity, cursor_types=DISTANCE_CURSOR, check=check_corridor)
+
+    waypoints = [(float(lat), float(long)) for lat, long in data.get('waypoints') or []]
+    width = float(data.get('width') or current_app.config['CORRIDOR_DEFAULT_WIDTH'])
+
+    if user is not None and user.can(Permission.READ):
+
+        if len(waypoints) == 0:
+            return create_response(None, responses.MISSING_PARAMETER_422, ResponseMessages.FIND_MISSING_PARAMETER,
+                                   Location.__name__, 422)
+
+        locations, closest_waypoints = locations_along_route(session, waypoints, width)
+
+        limit = data.get('limit')
+        cursor = data.get('cursor')
+        page = rank_activities(session, locations, limit=limit,
+                               cursor=decode_cursor(cursor) if cursor is not None else None)
+
+        activities = serialize_page(session, locations, page, data.get('output'),
+                                    tags=dict((loc_id, {'waypoint': wp}) for loc_id, wp in closest_waypoints.items()))
+
+        if len(activities) > 0:
+            resp = create_response(activities, responses.SUCCESS_200,
+                                   ResponseMessages.FIND_SUCCESS, Activity.__name__, 200)
+            next_cursor = next_page_cursor(page, limit)
+            if next_cursor is not None:
+                resp.headers['next_cursor'] = next_cursor
+            return resp
+        else:
+            return create_response([], responses.BAD_REQUEST_400, ResponseMessages.FIND_NO_RESULTS,
+                                   Activity.__name__, 400)
 
     else:
         return create_response([], responses.UNAUTHORIZED_403, ResponseMessages.FIND_NOT_AUTHORIZED,
@@ -165,27 +684,37 @@ def find_tour_by_term(data_encoded):
     session = Session()
     user = http_auth.current_user
 
-    data_string = base64.b64decode(data_encoded).decode()
-    data = ast.literal_eval(data_string)
+    data = parse_spec(data_encoded, Activity)
 
     term = data.get("term")
 
-    if user not in session:
-        user = session.query(User).get(user.id)
-
     if user is not None and user.can(Permission.READ):
 
-        search_term = '%{}%'.format(term)
-        record_activities = session.query(Activity).filter(or_(Activity.name.ilike(search_term),
-                                                               Activity.description.ilike(search_term))).all()
+        limit = data.get('limit') or current_app.config['TERM_SEARCH_LIMIT']
+        record_activities = []
+
+        if current_app.config['TERM_SEARCH_MODE'] == 'fts':
+            query = Activity.search_query(term)
+            record_activities = session.query(Activity) \
+                .filter(Activity.search_vector.op('@@')(query)) \
+                .order_by(sql.func.ts_rank(Activity.search_vector, query).desc(), Activity.id) \
+                .limit(limit) \
+                .all()
+
+        # typo tolerant search, e.g. for misspelled names
+        if len(record_activities) == 0:
+            record_activities = fuzzy_filter(session.query(Activity), Activity.name, term, Activity.description) \
+                .order_by(Activity.id) \
+                .limit(limit) \
+                .all()
 
         if record_activities is None:
             return create_response(None, responses.BAD_REQUEST_400, ResponseMessages.FIND_NO_RESULTS,
                                    Activity.__name__, 400)
         else:
 
-            activities = [act.serialize(session=session, only=data.get('output'), enrich=data.get('enrich'))
-                          for act in record_activities]
+            activities = serialize_activities(session, record_activities, only=data.get('output'),
+                                              enrich=data.get('enrich'))
 
             return create_response(activities, responses.SUCCESS_200, ResponseMessages.FIND_SUCCESS,
                                    Activity.__name__, 200)
@@ -198,8 +727,7 @@ def find_tour_by_term(data_encoded):
 @main.route('/find_tour_by_area/<data_encoded>', methods=['GET'])
 @http_auth.login_required
 def find_tour_by_area(data_encoded):
-    data_string = base64.b64decode(data_encoded).decode()
-    data = ast.literal_eval(data_string)
+    data = parse_spec(data_encoded, Activity, keys_class=Region)
 
     keys = data.get('keys')
     output = data.get('output')
@@ -209,7 +737,15 @@ def find_tour_by_area(data_encoded):
     order_func = getattr(sql, order_by.get('dir'))
 
     session = Session()
-    res = session.query(Activity) \
+    projection = cached_projection(Activity, output)
+
+    if data.get('enrich'):
+        # enrichments follow the relationships, so the activities are loaded with the needed columns only
+        query = session.query(Activity).options(projection.load_options())
+    else:
+        query = projection.query(session, Activity.id.label('activity_id'))
+
+    res = query \
         .join(LocationActivity) \
         .join(Location) \
         .join(Region) \
@@ -217,13 +753,70 @@ def find_tour_by_area(data_encoded):
         .order_by(Activity.id.asc() if order_by is None else order_func(order_column)) \
         .all()
 
-    activities = [r.serialize(session=session, only=output, enrich=data.get('enrich')) for r in res]
+    if data.get('enrich'):
+        activities = serialize_activities(session, res, only=output, enrich=data.get('enrich'))
+    else:
+        # like the query of entities, an activity linked to several matching locations is returned once
+        activity_ids = set()
+        activities = []
+        for r in res:
+            if r.activity_id not in activity_ids:
+                activity_ids.add(r.activity_id)
+                activities.append(projection.serialize_row(r))
 
     session.expunge_all()
     session.close()
 
     return create_response(activities, responses.SUCCESS_200, ResponseMessages.FIND_SUCCESS, Activity.__name__, 200)
 
+
+@main.route('/autocomplete/<data_encoded>', methods=['GET'])
+@http_auth.login_required
+def autocomplete(data_encoded):
+    """
+    Endpoint to complete the term typed into the search box, answered from the in-memory prefix index
+    Args:
+        data_encoded: BASE64 encoded JSON with the typed {term}, optionally the maximum number of completions in
+            {limit} and the entity classes to complete, e.g. ['Activity', 'Region'], in {classes}
+
+    Returns:
+        Flask response, consisting of completions with class, id and name, response code, response message,
+        affected class, and http code
+    """
+    session = Session()
+    user = http_auth.current_user
+
+    data = parse_spec(data_encoded)
+
+    term = data.get('term')
+    classes = data.get('classes')
+
+    if user is not None and user.can(Permission.READ):
+
+        if not term:
+            session.close()
+            return create_response(None, responses.MISSING_PARAMETER_422, ResponseMessages.FIND_MISSING_PARAMETER,
+                                   None, 422)
+
+        if classes is not None and not set(classes) <= set(c.__name__ for c in AUTOCOMPLETE_CLASSES):
+            session.close()
+            return create_response(classes, responses.INVALID_FIELD_NAME_SENT_422,
+                                   ResponseMessages.LIST_INVALID_INPUT, None, 422)
+
+        refresh_name_index(session)
+        session.close()
+
+        completions = name_index.complete(term, limit=data.get('limit') or current_app.config['AUTOCOMPLETE_LIMIT'],
+                                          kinds=classes)
+        res = [{'class': kind, 'id': identifier, 'name': name} for kind, identifier, name in completions]
+
+        return create_response(res, responses.SUCCESS_200, ResponseMessages.FIND_SUCCESS, None, 200)
+
+    else:
+        session.close()
+        return create_response([], responses.UNAUTHORIZED_403, ResponseMessages.FIND_NOT_AUTHORIZED, None, 403)
+
+
 # TODO: umstellen auf data_encoded
 @main.route('/hike/<act_id>', methods=['GET'])
 @http_auth.login_required
@@ -234,9 +827,6 @@ def add_hike(act_id):
 
     typ = rq.args.get('typ')
 
-    if user not in session:
-        user = session.query(User).get(user.id)
-
     activity = session.query(Activity).filter(Activity.id == act_id).first()
 
     if activity is None:
@@ -246,18 +836,20 @@ def add_hike(act_id):
                                HikeRelation.__name__, 400)
 
     if user is not None and user.can(Permission.FOLLOW) and typ is not None:
+        # the hike relations need the user entity
+        user = session.query(User).get(user.id)
 
         if typ == 'add':
             hike = user.add_hike(activity, session)
             res = hike.serialize()
-            session_thread = Session()
+            session_thread = session_factory()
             statistic = Statistic.instance(session_thread)
             Thread(target=statistic.update_popularity, args=(session_thread, HikeRelation)).start()
         elif typ == 'check':
             res = True if user.has_hiked(activity) is True else False
         elif typ == 'rem':
             user.delete_hike(activity, session)
-            session_thread = Session()
+            session_thread = session_factory()
             statistic = Statistic.instance(session_thread)
             Thread(target=statistic.update_popularity, args=(session_thread, HikeRelation)).start()
 
@@ -280,9 +872,6 @@ def get_file(act_id):
 
     user = http_auth.current_user
 
-    if user not in session:
-        user = session.query(User).get(user.id)
-
     if user is not None and user.can(Permission.READ):
 
         activity = session.query(Activity).get(act_id)
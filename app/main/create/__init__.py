@@ -8,14 +8,13 @@ from app.entities.activity import Activity
 from app.entities.activity_type import ActivityType
 from app.entities.comment import Comment
 from app.entities.country import Country
-from app.entities.entity import Session
+from app.entities.entity import Session, session_factory
 from app.entities.location import Location
 from app.entities.location_activity import LocationActivity
 from app.entities.location_type import LocationType
 from app.entities.region import Region
 from app.entities.role import Permission
-from app.entities.user import User
-from app.main import check_integrity_error
+from app.main import check_integrity_error, tour_cache
 from app.utils import responses
 from app.utils.responses import create_response, ResponseMessages
 
@@ -25,9 +24,6 @@ crt = Blueprint('create', __name__)
 def create(data, user, class_type):
     session = Session()
 
-    if user not in session:
-        user = session.query(User).get(user.id)
-
     if user is not None and user.can(Permission.CREATE):
         data.update({'created_by': user.id})
         schema = class_type.get_insert_schema()
@@ -47,12 +43,14 @@ def create(data, user, class_type):
                 return resp
         else:
             session.expunge_all()
+            if class_type in [Activity, Location, LocationActivity, Region]:
+                tour_cache.clear()
             if class_type in [Activity, Country, Region, Location]:
-                session_thread = Session()
+                session_thread = session_factory()
                 statistic = Statistic.instance(session_thread)
                 Thread(target=statistic.update_number, args=(session_thread, class_type)).start()
             if class_type in [LocationActivity, Activity]:
-                session_thread = Session()
+                session_thread = session_factory()
                 statistic = Statistic.instance(session_thread)
                 Thread(target=statistic.update_popularity, args=(session_thread, class_type)).start()
         finally:
@@ -1,19 +1,18 @@
-import ast
-import base64
-
 from flask import Blueprint
 
 from app.auth import http_auth
 from app.entities.activity import Activity, ActivityAttributes
 from app.entities.activity_type import ActivityType
 from app.entities.country import Country
+from app.entities.enrichment import serialize_activities
 from app.entities.entity import Session
 from app.entities.location import Location
 from app.entities.location_type import LocationType
 from app.entities.region import Region
 from app.entities.role import Permission
-from app.entities.user import User
 from app.utils import responses
+from app.utils.projection import cached_projection
+from app.utils.request_spec import parse_spec
 from app.utils.responses import create_response, ResponseMessages
 
 find = Blueprint('find', __name__)
@@ -23,22 +22,24 @@ def by_id(user, id, classtype, data_encoded):
     session = Session()
     res = None
 
-    data_string = base64.b64decode(data_encoded).decode()
-    data = ast.literal_eval(data_string)
+    data = parse_spec(data_encoded, classtype)
 
     output = data.get('output')
 
-    if user not in session:
-        user = session.query(User).get(user.id)
-
     if user is not None and user.can(Permission.READ):
-        entity = session.query(classtype).get(id)
+        projection = cached_projection(classtype, output)
+
+        if classtype == Activity and data.get('enrich'):
+            # enrichments follow the relationships, so the entity is loaded with the needed columns only
+            entity = session.query(classtype).options(projection.load_options()).get(id)
+            if entity is not None:
+                res = serialize_activities(session, [entity], only=output, enrich=data.get('enrich'))[0]
+        else:
+            row = projection.query(session).filter(classtype.id == id).first()
+            if row is not None:
+                res = projection.serialize_row(row)
 
-        if entity is not None:
-            if classtype == Activity:
-                res = entity.serialize(session, enrich=data.get('enrich'), only=data.get('output'))
-            else:
-                res = entity.convert_to_presentation_schema(only=output)
+        if res is not None:
             session.expunge_all()
             session.close()
             return create_response(res, responses.SUCCESS_200, ResponseMessages.LIST_SUCCESS, classtype.__name__, 200)
@@ -1,8 +1,7 @@
 import sqlalchemy as sql
-import base64
-import ast
 
-from flask import Blueprint
+from datetime import datetime
+from flask import Blueprint, current_app
 
 from app.auth import http_auth
 from app.entities.activity import Activity
@@ -16,71 +15,204 @@ from app.entities.location_activity import LocationActivity
 from app.entities.location_type import LocationType
 from app.entities.region import Region
 from app.utils import responses
-from app.utils.responses import create_response, ResponseMessages
+from app.utils.encoding import get_encoder
+from app.utils.helpers import decode_cursor, encode_cursor
+from app.utils.projection import cached_projection, supports_projection
+from app.utils.request_spec import InvalidRequestSpec, parse_spec, SCALAR
+from app.utils.responses import create_response, create_stream_response, ResponseMessages
+from app.utils.search import fuzzy_filter
 
 lst = Blueprint('list', __name__)
 
+# cursor of the keyset pagination: (value of the order column, id) of the last row of a page
+KEYSET_CURSOR = (SCALAR, int)
+
+
+def keyset_filter(class_type, order_column, order_func, cursor):
+    """
+    restricts a query to the rows behind the cursor, the rows are ordered by the order column and the id, rows whose
+    order column is NULL follow all others, see :func:`~keyset_order`
+    Args:
+        class_type: class of the listed entities
+        order_column: column the rows are ordered by
+        order_func: sql.asc or sql.desc
+        cursor: cursor created by :func:`~keyset_cursor`
+
+    Returns:
+        filter condition
+
+    Raises:
+        InvalidRequestSpec: if the value of the cursor does not match the type of the order column
+    """
+    value, last_id = decode_cursor(cursor)
+
+    if value is not None:
+        try:
+            if isinstance(order_column.type, sql.DateTime):
+                value = datetime.fromisoformat(value)
+            if not isinstance(value, order_column.type.python_type):
+                raise TypeError(value)
+        except (TypeError, ValueError, NotImplementedError):
+            raise InvalidRequestSpec('malformed cursor: {}'.format(cursor), class_type)
+
+    behind_id = class_type.id < last_id if order_func == sql.desc else class_type.id > last_id
+
+    if value is None:
+        # the cursor points into the trailing NULL rows
+        return sql.and_(order_column.is_(None), behind_id)
+
+    keys = sql.tuple_(order_column, class_type.id)
+    condition = keys < (value, last_id) if order_func == sql.desc else keys > (value, last_id)
+
+    if order_column.expression.nullable:
+        condition = sql.or_(condition, order_column.is_(None))
+
+    return condition
+
+
+def keyset_order(order_column, order_func):
+    """
+    Returns:
+        order clause of the order column, NULL values are placed last in both directions, so that the keyset
+        filter can continue behind them
+    """
+    clause = order_func(order_column)
+
+    return clause.nullslast() if order_column.expression.nullable else clause
+
+
+def keyset_cursor(value, identifier):
+    """
+    Returns:
+        cursor pointing behind the row with the given order column value and id
+    """
+    return encode_cursor([value.isoformat() if isinstance(value, datetime) else value, identifier])
+
+
+def entity_serializer(class_type, output):
+    """
+    Returns:
+        function serializing a loaded entity with its schema, comments are completed with their author
+    """
+    schema = class_type.get_schema(many=False, only=output)
+
+    def serialize_row(entity):
+        row = schema.dump(entity)
+
+        if class_type == Comment:
+            row.update({'author': entity.get_author()})
+
+        return row
+
+    return serialize_row
+
+
+def stream_rows(session, query, serialize_row, batch_size):
+    """
+    serializes the results of a query into a JSON array while they are fetched, only one batch of rows is held in
+    memory at a time
+    Args:
+        session: database session, closed once all rows are written
+        query: query of the rows to serialize
+        serialize_row: function turning a row into a dict
+        batch_size: number of rows fetched at once
+
+    Returns:
+        generator of JSON chunks
+    """
+    encode = get_encoder(current_app.config['JSON_ENCODER'])
+
+    try:
+        yield b'['
+        for idx, r in enumerate(query.yield_per(batch_size)):
+            yield (b',' if idx > 0 else b'') + encode(serialize_row(r))
+        yield b']'
+    finally:
+        session.expunge_all()
+        session.close()
+
 
 def list_all(class_type, data_encoded):
     session = Session()
     res = None
 
-    data_string = base64.b64decode(data_encoded).decode()
-    data = ast.literal_eval(data_string)
+    data = parse_spec(data_encoded, class_type, cursor_types=KEYSET_CURSOR)
 
     keys = data.get('keys')
     term = data.get('term')
     output = data.get('output')
     order_by = data.get('order_by')
+    limit = data.get('limit')
+    cursor = data.get('cursor')
 
-    order_column = getattr(class_type, order_by.get('column'))
-    order_func = getattr(sql, order_by.get('dir'))
-
-    if term is not None and keys is None:
-        search_term = '%{}%'.format(term)
-
-        res = session \
-            .query(class_type) \
-            .filter(class_type.name.ilike(search_term)) \
-            .order_by(class_type.id.asc() if order_by is None else order_func(order_column)) \
-            .all()
-    elif term is not None and keys is not None:
-        search_term = '%{}%'.format(term)
-
-        res = session \
-            .query(class_type) \
-            .filter(class_type.name.ilike(search_term)) \
-            .filter_by(**keys)\
-            .order_by(class_type.id.asc() if order_by is None else order_func(order_column)) \
-            .all()
-
-    elif keys is not None:
-        res = session \
-            .query(class_type) \
-            .filter_by(**keys) \
-            .order_by(class_type.id.asc() if order_by is None else order_func(order_column)) \
-            .all()
+    if order_by is None:
+        order_column = class_type.id
+        order_func = sql.asc
     else:
-        res = session\
-            .query(class_type)\
-            .order_by(class_type.id.asc() if order_by is None else order_func(order_column))\
-            .all()
+        order_column = getattr(class_type, order_by.get('column'))
+        order_func = getattr(sql, order_by.get('dir'))
 
-    schema = class_type.get_schema(many=True, only=output)
+    # comments are completed with their author and therefore loaded as entities
+    projected = class_type != Comment and supports_projection(class_type, output)
 
-    if class_type == Comment:
-        authors = [r.get_author() for r in res]
+    if projected:
+        projection = cached_projection(class_type, output)
+        # the sort key of every row is appended for the cursor of the next page
+        query = projection.query(session, order_column.label('keyset_value'), class_type.id.label('keyset_id'))
+        serialize_row = projection.serialize_row
+    else:
+        query = session.query(class_type)
+        serialize_row = entity_serializer(class_type, output)
 
-    session.expunge_all()
-    session.close()
+    if keys is not None:
+        query = query.filter_by(**keys)
+
+    if term is not None:
+        # the similarity ranking cannot be continued by a cursor
+        if not hasattr(class_type, 'name') or cursor is not None:
+            session.expunge_all()
+            session.close()
+            return create_response(None, responses.INVALID_FIELD_NAME_SENT_422, ResponseMessages.LIST_INVALID_INPUT,
+                                   class_type.__name__, 422)
 
-    res = schema.dump(res)
+        # most similar names first, the requested order only breaks ties
+        query = fuzzy_filter(query, class_type.name, term)
+        limit = limit or current_app.config['TERM_SEARCH_LIMIT']
 
-    if class_type == Comment:
-        [r.update({'author': authors[idx]}) for idx, r in enumerate(res)]
+    elif cursor is not None:
+        query = query.filter(keyset_filter(class_type, order_column, order_func, cursor))
 
-    return create_response(res, responses.SUCCESS_200, ResponseMessages.FIND_SUCCESS,
+    # the id makes the order unique, so that pages neither skip nor repeat rows
+    query = query.order_by(keyset_order(order_column, order_func), order_func(class_type.id))
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    if data.get('stream'):
+        return create_stream_response(stream_rows(session, query, serialize_row,
+                                                  current_app.config['LIST_STREAM_BATCH_SIZE']),
+                                      responses.SUCCESS_200, ResponseMessages.FIND_SUCCESS, class_type.__name__, 200)
+
+    rows = query.all()
+
+    next_cursor = None
+    if term is None and limit is not None and len(rows) == limit:
+        if projected:
+            next_cursor = keyset_cursor(rows[-1].keyset_value, rows[-1].keyset_id)
+        else:
+            next_cursor = keyset_cursor(getattr(rows[-1], order_column.key), rows[-1].id)
+
+    res = [serialize_row(r) for r in rows]
+
+    session.expunge_all()
+    session.close()
+
+    resp = create_response(res, responses.SUCCESS_200, ResponseMessages.FIND_SUCCESS,
                            class_type.__name__, 200)
+    if next_cursor is not None:
+        resp.headers['next_cursor'] = next_cursor
+
+    return resp
 
 
 @lst.route('/country/<data>', methods=['GET'])
@@ -1,11 +1,16 @@
 from flask import Blueprint
 
 from app.auth import http_auth
+from app.email import outbox_sender
 from app.entities.Statistic import Statistic
-from app.entities.entity import Session
+from app.entities.entity import Session, pool_stats, schema_cache_stats
 from app.entities.hike_relations import HikeRelation
-from app.main import count
+from app.entities.role import Permission
+from app.main import count, tour_cache
 from app.utils import responses
+from app.utils.auth_cache import token_cache
+from app.utils.hashing import hashing_executor
+from app.utils.request_spec import spec_cache_stats
 from app.utils.responses import ResponseMessages, create_response
 
 
@@ -40,3 +45,22 @@ def stats_general():
 
     return create_response(result, responses.SUCCESS_200, ResponseMessages.FIND_SUCCESS, None, 200)
 
+
+@stats.route('/runtime', methods=['GET'])
+@http_auth.login_required
+def stats_runtime():
+
+    if not http_auth.current_user.can(Permission.ADMIN):
+        return create_response(None, responses.UNAUTHORIZED_403, ResponseMessages.FIND_NOT_AUTHORIZED, None, 403)
+
+    result = {
+        'tourCache': tour_cache.stats(),
+        'schemaCache': schema_cache_stats(),
+        'requestSpecCache': spec_cache_stats(),
+        'authCache': token_cache.stats(),
+        'hashing': hashing_executor.stats(),
+        'emailOutbox': outbox_sender.stats(),
+        'connectionPool': pool_stats()
+    }
+
+    return create_response(result, responses.SUCCESS_200, ResponseMessages.FIND_SUCCESS, None, 200)
@@ -12,8 +12,7 @@ from app.entities.location_activity import LocationActivity
 from app.entities.location_type import LocationType
 from app.entities.region import Region
 from app.entities.role import Permission
-from app.entities.user import User
-from app.main import check_integrity_error
+from app.main import check_integrity_error, tour_cache
 from app.utils import responses
 from app.utils.responses import create_response, ResponseMessages
 
@@ -23,9 +22,6 @@ updt = Blueprint('update', __name__)
 def update(data, user, class_type):
     session = Session()
 
-    if user not in session:
-        user = session.query(User).get(user.id)
-
     if user is not None and user.can(Permission.CREATE):
         entity = session.query(class_type).filter_by(id=data.get(str(class_type.get_attributes().ID))).first()
         if entity is not None:
@@ -41,7 +37,9 @@ def update(data, user, class_type):
                 else:
                     resp = check_result
                     return resp
-
+            else:
+                if class_type in [Activity, Location, LocationActivity, Region]:
+                    tour_cache.clear()
             finally:
                 res = entity.convert_to_insert_schema()
                 session.expunge_all()
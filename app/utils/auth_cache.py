@@ -0,0 +1,90 @@
+"""
+In-process cache of verified auth tokens
+"""
+
+import time
+
+from collections import defaultdict
+from functools import lru_cache
+
+from itsdangerous import TimedJSONWebSignatureSerializer
+
+from app.entities.role import role_table
+from app.utils.cache import ResultCache
+from config import Config
+
+
+class Principal:
+    """
+    lightweight authenticated user, holds what is needed to authorize a request without a database query, the
+    permissions are looked up in the role table so that changed roles take effect for cached tokens as well
+    """
+    __slots__ = ('id', 'role_id', 'confirmed')
+
+    def __init__(self, identifier, role_id, confirmed):
+        self.id = identifier
+        self.role_id = role_id
+        self.confirmed = confirmed
+
+    @staticmethod
+    def of(user):
+        """
+        :param user: authenticated user
+        :return: principal of the user
+        """
+        return Principal(user.id, user.role_id, bool(user.confirmed))
+
+    def can(self, perm):
+        return role_table.has_permission(self.role_id, perm)
+
+
+class TokenCache(ResultCache):
+    """
+    maps verified auth tokens to principals, all tokens of a user can be dropped at once
+    """
+
+    def __init__(self, max_size=4096, ttl=60):
+        super().__init__(max_size=max_size, ttl=ttl)
+        self._user_tokens = defaultdict(set)
+
+    def set(self, token, principal, expires_at=None):
+        """
+        :param token: verified auth token
+        :param principal: principal of the token
+        :param expires_at: expiration of the token as UNIX timestamp, the entry never outlives the token
+        """
+        ttl = self.ttl if expires_at is None else min(self.ttl, expires_at - time.time())
+        if ttl <= 0:
+            return
+
+        super().set(token, principal, ttl=ttl)
+
+        with self._lock:
+            # tokens evicted from the cache meanwhile are forgotten
+            tokens = {t for t in self._user_tokens[principal.id] if t in self._entries}
+            tokens.add(token)
+            self._user_tokens[principal.id] = tokens
+
+    def invalidate_user(self, user_id):
+        """
+        drops all cached tokens of a user, e.g. once a new session id is issued
+        """
+        with self._lock:
+            for token in self._user_tokens.pop(user_id, ()):
+                self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_tokens.clear()
+
+
+@lru_cache(maxsize=16)
+def get_serializer(secret_key, expires_in=None):
+    """
+    :return: shared serializer for auth tokens instead of one per request
+    """
+    return TimedJSONWebSignatureSerializer(secret_key, expires_in=expires_in)
+
+
+token_cache = TokenCache(max_size=Config.AUTH_CACHE_SIZE, ttl=Config.AUTH_CACHE_TTL)
@@ -0,0 +1,141 @@
+"""
+In-memory prefix index over the names of activities, locations, regions and countries
+"""
+
+import bisect
+import threading
+import time
+
+from config import Config
+
+
+def normalize(name):
+    """
+    :param name: name or search term
+    :return: case-insensitive form used for prefix comparison
+    """
+    return ' '.join(name.casefold().split())
+
+
+def name_keys(name):
+    """
+    every word of a name starts a key, so that 'arber' completes 'Großer Arber'
+    :param name: name of an entry
+    :return: list of keys
+    """
+    words = normalize(name).split(' ')
+
+    return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class PrefixIndex:
+    """
+    sorted array of (key, kind, id) searched with bisect, inserts and renames keep the array sorted so that
+    queries never have to wait for a rebuild
+    """
+
+    def __init__(self, check_interval=30):
+        """
+        :param check_interval: seconds between two checks whether the index is stale, see :meth:`~claim_check`
+        """
+        self._lock = threading.Lock()
+        self._names = {}
+        self._keys = []
+        self.check_interval = check_interval
+        self._next_check = 0.0
+        self.state = None
+        self.built = False
+
+    def __len__(self):
+        return len(self._names)
+
+    def build(self, rows, state=None):
+        """
+        replaces the content of the index
+        :param rows: iterable of (kind, id, name), kind is the name of the entity class
+        :param state: opaque description of the source the rows were read from, see :meth:`~claim_check`
+        """
+        names = {(kind, identifier): name for kind, identifier, name in rows if name}
+        keys = sorted((key, kind, identifier) for (kind, identifier), name in names.items() for key in name_keys(name))
+
+        with self._lock:
+            self._names = names
+            self._keys = keys
+            self._next_check = time.monotonic() + self.check_interval
+            self.state = state
+            self.built = True
+
+    def claim_check(self):
+        """
+        the index only knows the changes made in this process, the caller compares the state of the source with
+        :attr:`~state` and rebuilds the index if they differ, only one caller per check interval is asked to do so
+        :return: True if the index has not been built or the check interval has passed
+        """
+        with self._lock:
+            if self.built and time.monotonic() < self._next_check:
+                return False
+
+            self._next_check = time.monotonic() + self.check_interval
+            return True
+
+    def _remove_keys(self, kind, identifier):
+        name = self._names.pop((kind, identifier), None)
+
+        if name is not None:
+            for key in name_keys(name):
+                pos = bisect.bisect_left(self._keys, (key, kind, identifier))
+                if pos < len(self._keys) and self._keys[pos] == (key, kind, identifier):
+                    del self._keys[pos]
+
+    def update(self, kind, identifier, name):
+        """
+        inserts an entry or renames it
+        """
+        with self._lock:
+            self._remove_keys(kind, identifier)
+
+            if name:
+                self._names[(kind, identifier)] = name
+                for key in name_keys(name):
+                    bisect.insort(self._keys, (key, kind, identifier))
+
+    def complete(self, prefix, limit=10, kinds=None):
+        """
+        finds the entries whose name or one of its words starts with the prefix
+        :param prefix: typed search term
+        :param limit: maximum number of completions
+        :param kinds: optional collection of entity class names to restrict the completions to
+        :return: list of (kind, id, name) by matched key, names starting with the prefix first
+        """
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+
+        # dicts keep the key order, an entry matched by an inner word first moves up once its name matches as well
+        leading, inner = {}, {}
+
+        with self._lock:
+            pos = bisect.bisect_left(self._keys, (prefix,))
+
+            # inner matches may sort before names starting with the prefix, so the scan only stops once enough of
+            # the latter are found
+            while pos < len(self._keys) and len(leading) < limit:
+                key, kind, identifier = self._keys[pos]
+                pos += 1
+
+                if not key.startswith(prefix):
+                    break
+                if (kinds is not None and kind not in kinds) or (kind, identifier) in leading:
+                    continue
+
+                name = self._names[(kind, identifier)]
+                if normalize(name) == key:
+                    inner.pop((kind, identifier), None)
+                    leading[(kind, identifier)] = (kind, identifier, name)
+                elif len(inner) < limit:
+                    inner[(kind, identifier)] = (kind, identifier, name)
+
+        return (list(leading.values()) + list(inner.values()))[:limit]
+
+
+name_index = PrefixIndex(check_interval=Config.AUTOCOMPLETE_CHECK_INTERVAL)
@@ -0,0 +1,73 @@
+"""
+In-process caches
+"""
+
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    thread-safe LRU cache whose entries expire after a fixed time to live, which can be shortened per entry
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        """
+        Args:
+            max_size: maximum number of entries, the least recently used entry is evicted first
+            ttl: time to live of an entry in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """
+        Args:
+            key: key of the entry
+            value: cached value
+            ttl: time to live of this entry in seconds, the ttl of the cache if None
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict holding the number of entries, hits and misses
+        """
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,93 @@
+"""
+JSON encoding and compression of response bodies
+"""
+
+import gzip
+import json
+
+from datetime import date, datetime, time
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _default(obj):
+    # datetimes are written in ISO 8601 like marshmallow does
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(obj).__name__))
+
+
+def encode_stdlib(data):
+    """
+    :param data: data to encode
+    :return: compact UTF-8 JSON with sorted keys as bytes
+    """
+    return json.dumps(data, default=_default, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def encode_orjson(data):
+    """
+    :param data: data to encode
+    :return: compact JSON with sorted keys as bytes, identical to :func:`~encode_stdlib` for the data of the
+        endpoints
+    """
+    return orjson.dumps(data, default=_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def get_encoder(name='auto'):
+    """
+    :param name: 'orjson', 'stdlib' or 'auto', which prefers orjson if it is installed
+    :return: function encoding data into JSON bytes
+    """
+    if name == 'orjson' or (name == 'auto' and orjson is not None):
+        if orjson is None:
+            raise RuntimeError('JSON encoder orjson is not installed')
+        return encode_orjson
+
+    return encode_stdlib
+
+
+COMPRESSORS = {
+    'gzip': lambda body: gzip.compress(body, compresslevel=6),
+    'br': lambda body: brotli.compress(body, quality=5),
+}
+
+
+def available_encodings(names):
+    """
+    :param names: content encodings in order of preference, e.g. ['br', 'gzip']
+    :return: the encodings which are supported and whose library is installed
+    """
+    return [n for n in names if n in COMPRESSORS and (n != 'br' or brotli is not None)]
+
+
+def compress(body, accept_encodings, encodings, min_size):
+    """
+    compresses a body with the first of the encodings accepted by the client
+    :param body: response body as bytes
+    :param accept_encodings: Accept-Encoding header of the request, parsed by werkzeug
+    :param encodings: encodings offered by the server in order of preference
+    :param min_size: bodies below this size in bytes are not compressed
+    :return: body and applied content encoding, None if the body is not compressed
+    """
+    if len(body) < min_size:
+        return body, None
+
+    for encoding in encodings:
+        if accept_encodings[encoding] > 0:
+            return COMPRESSORS[encoding](body), encoding
+
+    return body, None
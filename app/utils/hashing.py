@@ -0,0 +1,99 @@
+"""
+Bounded worker pool for password hashing
+"""
+
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import Config
+
+
+class HashingSaturated(RuntimeError):
+    """
+    raised when all workers are busy and the queue is full
+    """
+
+
+class HashingExecutor:
+    """
+    runs the PBKDF2 computations on a fixed number of threads, at most queue_depth further jobs wait for a worker
+    and any job beyond that is rejected immediately, so that a login storm cannot occupy all request workers
+    """
+
+    def __init__(self, workers=2, queue_depth=16):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hashing')
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_time = 0.0
+        self._run_time = 0.0
+        self._max_run_time = 0.0
+
+    def _timed(self, submitted, fn, args):
+        started = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+                self._wait_time += started - submitted
+                self._run_time += finished - started
+                self._max_run_time = max(self._max_run_time, finished - started)
+            self._slots.release()
+
+    def run(self, fn, *args):
+        """
+        runs fn(*args) on a hashing worker and waits for the result
+        :raises HashingSaturated: if all workers are busy and the queue is full
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingSaturated('password hashing is saturated')
+
+        with self._lock:
+            self._in_flight += 1
+
+        return self._executor.submit(self._timed, time.monotonic(), fn, args).result()
+
+    def stats(self):
+        """
+        :return: dict holding the pool size, current load and timings in milliseconds
+        """
+        with self._lock:
+            completed = max(self._completed, 1)
+
+            return {'workers': self.workers, 'queueDepth': self.queue_depth, 'inFlight': self._in_flight,
+                    'completed': self._completed, 'rejected': self._rejected,
+                    'avgWaitMs': round(self._wait_time / completed * 1000, 3),
+                    'avgRunMs': round(self._run_time / completed * 1000, 3),
+                    'maxRunMs': round(self._max_run_time * 1000, 3)}
+
+
+hashing_executor = HashingExecutor(workers=Config.HASHING_WORKERS, queue_depth=Config.HASHING_QUEUE_DEPTH)
+
+
+def hash_password(password, iterations):
+    """
+    :param password: plain password
+    :param iterations: number of PBKDF2 iterations
+    :return: salted hash, computed on the hashing pool
+    """
+    return hashing_executor.run(generate_password_hash, password, 'pbkdf2:sha256:{}'.format(iterations))
+
+
+def check_password(password_hash, password):
+    """
+    :return: whether the password matches the hash, checked on the hashing pool with the cost stored in the hash
+    """
+    return hashing_executor.run(check_password_hash, password_hash, password)
@@ -1,7 +1,11 @@
+import base64
+import json
 import math
 import string
 import random
 
+import numpy as np
+
 # in km
 EARTH_RADIUS = 6371
 
@@ -19,7 +23,7 @@ def deg_to_radian(val, backwards=False):
         return val * 180 / math.pi
 
 
-def distance_between_coordinates(lat1, long1, lat2, long2):
+def distance_between_coordinates(lat1, long1, lat2, long2, rounded=True):
     """
     calculates the distance between two geo-coordinates with the Haversine formula
     reference:
@@ -28,7 +32,8 @@ def distance_between_coordinates(lat1, long1, lat2, long2):
     :param long1: longitude of position one
     :param lat2: latituted of position two
     :param long2: longitude of position two
-    :return: ceiled distance between both coordinates
+    :param rounded: indicates whether the distance is ceiled
+    :return: (ceiled) distance between both coordinates
     """
 
     diff_lat = deg_to_radian(lat2 - lat1)
@@ -38,13 +43,124 @@ def distance_between_coordinates(lat1, long1, lat2, long2):
     left_form = math.sin(diff_lat / 2) ** 2
     right_form = math.cos(deg_to_radian(lat1)) * math.cos(deg_to_radian(lat2)) * math.sin(diff_long / 2) ** 2
 
-    return math.ceil(2 * EARTH_RADIUS * math.asin(math.sqrt(left_form + right_form)))
+    dist = 2 * EARTH_RADIUS * math.asin(math.sqrt(left_form + right_form))
+
+    return math.ceil(dist) if rounded else dist
+
+
+def distances_between_coordinates(lats, longs, ref_lats, ref_longs, rounded=True):
+    """
+    vectorized version of :func:`~distance_between_coordinates` for many positions at once
+    :param lats: latitudes of the positions
+    :param longs: longitudes of the positions
+    :param ref_lats: latitude of one reference point or latitudes of several reference points
+    :param ref_longs: longitude of one reference point or longitudes of several reference points
+    :param rounded: indicates whether the distances are ceiled, disable to keep the order of distances exact
+    :return: distance vector of shape (n,) for a single reference point, otherwise distance matrix of shape (m, n)
+             with one row per reference point
+    """
+    lats = np.radians(np.asarray(lats, dtype=float))
+    longs = np.radians(np.asarray(longs, dtype=float))
+    ref_lats = np.radians(np.asarray(ref_lats, dtype=float))
+    ref_longs = np.radians(np.asarray(ref_longs, dtype=float))
+
+    if ref_lats.ndim > 0:
+        ref_lats = ref_lats[:, np.newaxis]
+        ref_longs = ref_longs[:, np.newaxis]
+
+    # separate calculation into both terms of sum in the square root
+    left_form = np.sin((lats - ref_lats) / 2) ** 2
+    right_form = np.cos(ref_lats) * np.cos(lats) * np.sin((longs - ref_longs) / 2) ** 2
+
+    dist = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(left_form + right_form, 1)))
+
+    return np.ceil(dist) if rounded else dist
+
+
+def distances_to_segment(lats, longs, start, end):
+    """
+    calculates the distances of many positions to the line segment between two geo-coordinates, positions are
+    projected onto a plane (equirectangular) which is sufficiently exact for segments of a few hundred km
+    :param lats: latitudes of the positions
+    :param longs: longitudes of the positions
+    :param start: (lat, long) of the start of the segment
+    :param end: (lat, long) of the end of the segment
+    :return: distance vector in km
+    """
+    scale = math.cos(deg_to_radian((start[0] + end[0]) / 2))
+
+    def project(lat, long):
+        # longitude difference wrapped into [-180, 180) to handle the antimeridian
+        x = EARTH_RADIUS * deg_to_radian((np.asarray(long, dtype=float) - start[1] + 180) % 360 - 180) * scale
+        y = EARTH_RADIUS * deg_to_radian(np.asarray(lat, dtype=float) - start[0])
+        return x, y
+
+    px, py = project(lats, longs)
+    bx, by = project(end[0], end[1])
+    length = bx ** 2 + by ** 2
+    t = np.clip((px * bx + py * by) / length, 0, 1) if length > 0 else 0
+
+    return np.hypot(px - t * bx, py - t * by)
+
+
+def bounding_box(lat, long, dist):
+    """
+    calculates the bounding box of all positions within a distance around a geo-coordinate, the longitude range is
+    widened according to the latitude and split in two at the antimeridian
+    reference:
+        http://janmatuschek.de/LatitudeLongitudeBoundingCoordinates
+    :param lat: latitude of the center
+    :param long: longitude of the center
+    :param dist: distance in km
+    :return: minimum latitude, maximum latitude and list of (minimum longitude, maximum longitude)
+    """
+    ang_dist = dist / EARTH_RADIUS
+    delta_lat = deg_to_radian(ang_dist, backwards=True)
+    lat_min = lat - delta_lat
+    lat_max = lat + delta_lat
+
+    # box contains a pole, every longitude is possible
+    if lat_min <= -90 or lat_max >= 90:
+        return max(lat_min, -90), min(lat_max, 90), [(-180, 180)]
+
+    ratio = math.sin(ang_dist) / math.cos(deg_to_radian(lat))
+    if ang_dist >= math.pi / 2 or ratio >= 1:
+        return lat_min, lat_max, [(-180, 180)]
+
+    delta_long = deg_to_radian(math.asin(ratio), backwards=True)
+    long_min = long - delta_long
+    long_max = long + delta_long
+
+    if long_min < -180:
+        return lat_min, lat_max, [(long_min + 360, 180), (-180, long_max)]
+    elif long_max > 180:
+        return lat_min, lat_max, [(long_min, 180), (-180, long_max - 360)]
+    else:
+        return lat_min, lat_max, [(long_min, long_max)]
 
 
 def rand_alphanumeric(ln=16):
     return ''.join(random.choices(string.ascii_letters + string.digits, k=ln))
 
 
+def encode_cursor(values):
+    """
+    encodes the sort key of the last entry of a page into an opaque cursor
+    :param values: list of JSON serializable values
+    :return: BASE64 encoded cursor
+    """
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    decodes a cursor created by :func:`~encode_cursor`
+    :param cursor: BASE64 encoded cursor
+    :return: list of values
+    """
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+
+
 def sort_by_dist(dic):
     return dic['dist']
 
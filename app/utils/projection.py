@@ -0,0 +1,86 @@
+"""
+Serialization of entities straight from their columns, without loading ORM objects
+"""
+
+from functools import lru_cache
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import ColumnProperty, load_only
+
+
+class Projection:
+    """
+    translates the requested output of an entity class into the columns to query and serializes the resulting rows
+    with the fields of the entity schema, so that the output is identical to dumping the entities
+    """
+
+    def __init__(self, class_type, output=None):
+        schema = class_type.get_schema(many=False, only=output)
+        mapper = inspect(class_type)
+
+        self.class_type = class_type
+        self.fields = []
+        self.columns = []
+
+        for name, field in schema.dump_fields.items():
+            attribute = field.attribute or name
+            prop = mapper.attrs.get(attribute)
+
+            if not isinstance(prop, ColumnProperty):
+                raise ValueError('{} is not a column of {}'.format(attribute, class_type.__name__))
+
+            self.fields.append((field.data_key or name, attribute, field))
+            self.columns.append(getattr(class_type, attribute).label(attribute))
+
+        # the primary key and foreign keys are kept by load_only, relationships are loaded through them
+        self.loaded_columns = {attribute for _, attribute, _ in self.fields} | \
+            {c.key for c in mapper.column_attrs if any(col.primary_key or col.foreign_keys for col in c.columns)}
+
+    def query(self, session, *extra_columns):
+        """
+        :param session: database session
+        :param extra_columns: further columns appended to every row, e.g. for cursors
+        :return: query of the output columns, filter_by applies to the entity class
+        """
+        return session.query(*self.columns, *extra_columns).select_from(self.class_type)
+
+    def serialize_row(self, row):
+        """
+        :param row: row of a query created by :func:`~query`
+        :return: dict equal to the schema dump of the entity
+        """
+        return {key: field.serialize(attribute, row) for key, attribute, field in self.fields}
+
+    def load_options(self):
+        """
+        :return: query option restricting the loaded columns of entities which are serialized with their
+            relationships
+        """
+        return load_only(*self.loaded_columns)
+
+
+def supports_projection(class_type, output=None):
+    """
+    :return: whether every requested output field is backed by a column of the entity class
+    """
+    try:
+        cached_projection(class_type, output)
+    except ValueError:
+        return False
+
+    return True
+
+
+@lru_cache(maxsize=256)
+def _projection(class_type, output):
+    return Projection(class_type, output)
+
+
+def cached_projection(class_type, output=None):
+    """
+    shared projection per entity class and requested output
+    """
+    if isinstance(output, (list, tuple, set)):
+        output = frozenset(output)
+
+    return _projection(class_type, output)
@@ -0,0 +1,188 @@
+"""
+Decoding and validation of the BASE64 encoded request specifications of the read endpoints
+"""
+
+import ast
+import base64
+import binascii
+import json
+
+from functools import lru_cache
+from types import MappingProxyType
+
+from app.utils.helpers import decode_cursor
+from config import Config
+
+ORDER_DIRECTIONS = ('asc', 'desc')
+
+# types of the values of a cursor, by default two JSON scalars
+SCALAR = (str, int, float, type(None))
+CURSOR_TYPES = (SCALAR, SCALAR)
+
+# attributes of related entities which are never returned through an enrichment
+HIDDEN_ATTRIBUTES = frozenset({'password_hash', 'session_id'})
+
+
+class InvalidRequestSpec(ValueError):
+    """
+    raised for request specifications which cannot be decoded or refer to unknown attributes
+    """
+
+    def __init__(self, msg, class_type=None):
+        super().__init__(msg)
+        self.class_name = class_type.__name__ if class_type is not None else None
+
+
+def freeze(value):
+    """
+    converts decoded data into read-only structures, so that cached specifications cannot be modified by a request
+    :param value: decoded data
+    :return: dicts as read-only mappings, lists as tuples
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+
+    return value
+
+
+def decode_spec(data_encoded):
+    """
+    :param data_encoded: BASE64 encoded JSON or Python literal, the latter is the legacy format
+    :return: decoded dict
+    """
+    try:
+        data_string = base64.b64decode(data_encoded).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise InvalidRequestSpec('request specification is not BASE64 encoded')
+
+    try:
+        data = json.loads(data_string)
+    except ValueError:
+        try:
+            data = ast.literal_eval(data_string)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            raise InvalidRequestSpec('request specification is neither JSON nor a literal')
+
+    if not isinstance(data, dict):
+        raise InvalidRequestSpec('request specification is not an object')
+
+    return data
+
+
+def validate_spec(data, class_type, keys_class):
+    """
+    checks the attribute names in output, order_by, enrich and keys against the attributes of the entity classes,
+    the attributes requested through enrich are checked against the related entity
+    :param data: decoded specification
+    :param class_type: entity class which is returned
+    :param keys_class: entity class which is filtered by keys
+    """
+    attributes = {str(a) for a in class_type.get_attributes()}
+
+    output = data.get('output')
+    if output is not None and (not isinstance(output, (list, tuple)) or not set(output) <= attributes):
+        raise InvalidRequestSpec('unknown attributes in output: {}'.format(output), class_type)
+
+    order_by = data.get('order_by')
+    if order_by is not None and (not isinstance(order_by, dict) or order_by.get('column') not in attributes or
+                                 order_by.get('dir') not in ORDER_DIRECTIONS):
+        raise InvalidRequestSpec('invalid order_by: {}'.format(order_by), class_type)
+
+    enrich = data.get('enrich')
+    if enrich is not None:
+        enrichments = class_type.get_enrichments()
+        if not isinstance(enrich, dict) or not set(enrich) <= enrichments.keys():
+            raise InvalidRequestSpec('unknown enrichments: {}'.format(enrich), class_type)
+
+        for method, value in enrich.items():
+            related = enrichments[method]
+            if related is not None and (value in HIDDEN_ATTRIBUTES or value not in {str(a) for a in related}):
+                raise InvalidRequestSpec('unknown attribute for {}: {}'.format(method, value), class_type)
+
+    keys = data.get('keys')
+    if keys is not None and (not isinstance(keys, dict) or
+                             not set(keys) <= {str(a) for a in keys_class.get_attributes()}):
+        raise InvalidRequestSpec('unknown attributes in keys: {}'.format(keys), keys_class)
+
+
+def validate_page(data, cursor_types):
+    """
+    checks that limit is a positive integer and that cursor decodes to values of the given types
+    :param data: decoded specification
+    :param cursor_types: tuple holding the accepted types of each value of the cursor
+    """
+    limit = data.get('limit')
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+        raise InvalidRequestSpec('limit must be a positive integer: {}'.format(limit))
+
+    cursor = data.get('cursor')
+    if cursor is not None:
+        try:
+            values = decode_cursor(cursor)
+        except (AttributeError, binascii.Error, UnicodeDecodeError, ValueError):
+            raise InvalidRequestSpec('malformed cursor: {}'.format(cursor))
+
+        if not isinstance(values, list) or len(values) != len(cursor_types) or \
+                not all(isinstance(v, t) for v, t in zip(values, cursor_types)):
+            raise InvalidRequestSpec('malformed cursor: {}'.format(cursor))
+
+
+def bounded(value, name, low, high):
+    """
+    :param value: number or string holding a number
+    :param name: name of the value in the error message
+    :return: value as float
+    :raises InvalidRequestSpec: if the value is not a number between low and high
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise InvalidRequestSpec('{} is not a number: {}'.format(name, value))
+
+    if not low <= number <= high:
+        raise InvalidRequestSpec('{} must be between {} and {}: {}'.format(name, low, high, value))
+
+    return number
+
+
+@lru_cache(maxsize=Config.REQUEST_SPEC_CACHE_SIZE)
+def _parse_spec(data_encoded, class_type, keys_class, cursor_types, check):
+    data = decode_spec(data_encoded)
+    validate_page(data, cursor_types)
+
+    try:
+        if class_type is not None:
+            validate_spec(data, class_type, keys_class)
+        if check is not None:
+            check(data)
+    except (TypeError, AttributeError):
+        raise InvalidRequestSpec('malformed request specification', class_type)
+
+    return freeze(data)
+
+
+def parse_spec(data_encoded, class_type=None, keys_class=None, cursor_types=CURSOR_TYPES, check=None):
+    """
+    decodes and validates a request specification, the frontend sends the same few specifications over and over
+    again, so the results are kept in a bounded LRU cache keyed by the encoded string
+    :param data_encoded: BASE64 encoded specification
+    :param class_type: optional entity class whose attributes are requested
+    :param keys_class: entity class filtered by keys, class_type if None
+    :param cursor_types: accepted types of the values of the cursor
+    :param check: optional function validating the parameters of an endpoint, raises InvalidRequestSpec
+    :return: read-only specification
+    :raises InvalidRequestSpec: if the specification cannot be decoded, refers to unknown attributes or holds an
+    invalid limit, cursor or parameter
+    """
+    return _parse_spec(data_encoded, class_type, keys_class or class_type, cursor_types, check)
+
+
+def spec_cache_stats():
+    """
+    :return: dict holding the number of cached specifications, hits and misses
+    """
+    info = _parse_spec.cache_info()
+
+    return {'size': info.currsize, 'hits': info.hits, 'misses': info.misses}
@@ -3,7 +3,9 @@ Standard class of HTTP responses
 """
 
 from enum import Enum
-from flask import jsonify, make_response
+from flask import Response, current_app, has_request_context, request, stream_with_context
+
+from app.utils.encoding import available_encodings, compress, get_encoder
 
 INVALID_FIELD_NAME_SENT_422 = {
     "http_code": 422,
@@ -40,6 +42,11 @@ UNAUTHORIZED_403 = {
     "code": "notAuthorized"
 }
 
+SERVICE_UNAVAILABLE_503 = {
+    "http_code": 503,
+    "code": "serviceUnavailable"
+}
+
 SUCCESS_200 = {
     "http_code": 200,
     "code": "success"
@@ -58,7 +65,31 @@ SUCCESS_204 = {
 
 def create_response(data, http_resp, msg, classname, http_code):
 
-    resp = make_response(jsonify(data), http_code)
+    body = get_encoder(current_app.config['JSON_ENCODER'])(data)
+    encoding = None
+
+    if has_request_context():
+        body, encoding = compress(body, request.accept_encodings,
+                                  available_encodings(current_app.config['RESPONSE_COMPRESSION']),
+                                  current_app.config['RESPONSE_COMPRESSION_MIN_SIZE'])
+
+    resp = Response(body, status=http_code, mimetype='application/json')
+    if encoding is not None:
+        resp.headers['Content-Encoding'] = encoding
+    if len(current_app.config['RESPONSE_COMPRESSION']) > 0:
+        resp.vary.add('Accept-Encoding')
+    resp.headers['http_response'] = http_resp
+    resp.headers['msg'] = msg
+    resp.headers['class'] = classname
+
+    return resp
+
+
+def create_stream_response(chunks, http_resp, msg, classname, http_code):
+    """
+    response whose JSON body is written incrementally while the generator chunks is consumed
+    """
+    resp = Response(stream_with_context(chunks), status=http_code, mimetype='application/json')
     resp.headers['http_response'] = http_resp
     resp.headers['msg'] = msg
     resp.headers['class'] = classname
@@ -87,6 +118,8 @@ class ResponseMessages(Enum):
     AUTH_EMAIL_REQUESTED = "[auth] change email requested"
     AUTH_EMAIL_CHANGED = "[auth] email change successful"
     AUTH_EMAIL_FAILED = "[auth] email change failed"
+    AUTH_LOGOUT_SUCCESSFUL = "[auth] logout successful"
+    AUTH_BUSY = "[auth] too many concurrent password checks, retry later"
     MAIN_NO_USER_INFORMATION = "[main] no information about user provided"
     MAIN_NO_DATA = "[main] data could not be retrieved from request"
     CREATE_SUCCESS = "[create] {} successful"
@@ -104,6 +137,7 @@ class ResponseMessages(Enum):
     FIND_NO_RESULTS = "[find] {}, no results"
     FIND_SUCCESS = "[find] {}, successful"
     FIND_NOT_AUTHORIZED = "[find] no permission"
+    REQUEST_INVALID_SPEC = "[request] invalid request specification"
     INIT_NOT_AUTHORIZED = "[init] no permission"
     INIT_SUCCESS = '[init] successful'
     INIT_ERROR_DURING_CREATE = '[init] error during create'
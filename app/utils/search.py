@@ -0,0 +1,28 @@
+"""
+Typo tolerant search on the trigram (pg_trgm) indexes of the name columns
+"""
+
+from sqlalchemy import func, or_
+
+
+def fuzzy_filter(query, column, term, *substring_columns):
+    """
+    restricts a query to rows whose column is similar to the term or contains it, ordered by similarity, all
+    conditions are answered by the trigram indexes
+    Args:
+        query: query to restrict
+        column: column compared with the term, e.g. name
+        term: search term
+        *substring_columns: further columns that match if they contain the term
+
+    Returns:
+        restricted and ordered query
+    """
+    search_term = '%{}%'.format(term)
+
+    # '%%' is the escaped pg_trgm similarity operator '%'
+    return query \
+        .filter(or_(column.op('%%')(term),
+                    column.ilike(search_term),
+                    *[c.ilike(search_term) for c in substring_columns])) \
+        .order_by(func.similarity(column, term).desc())
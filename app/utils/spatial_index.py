@@ -0,0 +1,315 @@
+"""
+In-memory spatial index over the coordinates of all locations
+"""
+
+import heapq
+import math
+import threading
+import time
+
+import numpy as np
+
+from app.utils.helpers import EARTH_RADIUS
+from config import Config
+
+
+def to_cartesian(lat, long):
+    """
+    projects geo-coordinates onto the unit sphere, so that the euclidean (chord) distance between two points is a
+    monotonic function of their great-circle distance
+    :param lat: latitude or array of latitudes in degrees
+    :param long: longitude or array of longitudes in degrees
+    :return: array of shape (..., 3) holding x, y and z
+    """
+    lat = np.radians(np.asarray(lat, dtype=float))
+    long = np.radians(np.asarray(long, dtype=float))
+    cos_lat = np.cos(lat)
+
+    return np.stack((cos_lat * np.cos(long), cos_lat * np.sin(long), np.sin(lat)), axis=-1)
+
+
+def km_to_chord(dist):
+    """
+    converts a great-circle distance into the corresponding chord length on the unit sphere
+    :param dist: distance in km
+    :return: chord length
+    """
+    return 2 * math.sin(min(dist / (2 * EARTH_RADIUS), math.pi / 2))
+
+
+def chord_to_km(chord):
+    """
+    converts chord lengths on the unit sphere back into great-circle distances
+    :param chord: chord length or array of chord lengths
+    :return: distance in km
+    """
+    return 2 * EARTH_RADIUS * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+class KDTree:
+    """
+    static KD-tree over points in three dimensions, every node keeps the bounding box of its points for pruning
+    """
+
+    def __init__(self, points, leaf_size=32):
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(points))
+        # every node: [start, end, lower corner, upper corner, left child, right child]
+        self.nodes = []
+
+        if len(points) > 0:
+            self._build(points, 0, len(points))
+
+        self.points = points[self.order]
+
+    def _build(self, points, start, end):
+        idx = self.order[start:end]
+        low = points[idx].min(axis=0)
+        high = points[idx].max(axis=0)
+        node = [start, end, low, high, -1, -1]
+        node_idx = len(self.nodes)
+        self.nodes.append(node)
+
+        if end - start > self.leaf_size:
+            axis = int(np.argmax(high - low))
+            mid = (start + end) // 2
+            self.order[start:end] = idx[np.argpartition(points[idx, axis], mid - start)]
+            node[4] = self._build(points, start, mid)
+            node[5] = self._build(points, mid, end)
+
+        return node_idx
+
+    def _box_dist(self, node, point):
+        delta = np.maximum(np.maximum(node[2] - point, point - node[3]), 0)
+        return math.sqrt(float(delta @ delta))
+
+    def query_radius(self, point, radius):
+        """
+        :param point: cartesian query point
+        :param radius: maximum chord length
+        :return: positions within the tree and their chord distances
+        """
+        positions, dists = [], []
+        stack = [0] if self.nodes else []
+
+        while stack:
+            node = self.nodes[stack.pop()]
+            if self._box_dist(node, point) > radius:
+                continue
+
+            if node[4] == -1:
+                d = np.linalg.norm(self.points[node[0]:node[1]] - point, axis=1)
+                hits = np.nonzero(d <= radius)[0]
+                positions.append(hits + node[0])
+                dists.append(d[hits])
+            else:
+                stack.extend((node[4], node[5]))
+
+        if not positions:
+            return np.empty(0, dtype=int), np.empty(0)
+
+        return np.concatenate(positions), np.concatenate(dists)
+
+    def query_nearest(self, point, k, radius=math.inf):
+        """
+        best-first search for the k nearest points
+        :param point: cartesian query point
+        :param k: number of neighbours
+        :param radius: maximum chord length
+        :return: positions within the tree and their chord distances, ordered by distance
+        """
+        best = []
+        candidates = [(self._box_dist(self.nodes[0], point), 0)] if self.nodes and k > 0 else []
+
+        while candidates:
+            box_dist, idx = heapq.heappop(candidates)
+            if box_dist > radius or (len(best) == k and box_dist > -best[0][0]):
+                break
+
+            node = self.nodes[idx]
+            if node[4] == -1:
+                d = np.linalg.norm(self.points[node[0]:node[1]] - point, axis=1)
+                for pos in np.nonzero(d <= radius)[0]:
+                    item = (-float(d[pos]), int(pos) + node[0])
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+            else:
+                for child in (node[4], node[5]):
+                    heapq.heappush(candidates, (self._box_dist(self.nodes[child], point), child))
+
+        best.sort(reverse=True)
+
+        return np.array([pos for _, pos in best], dtype=int), np.array([-d for d, _ in best])
+
+
+class SpatialIndex:
+    """
+    keeps the coordinates of all entries in memory and answers radius and k-nearest queries through a KD-tree,
+    entries changed after the tree was built are kept in a small overlay which is searched linearly, the tree is
+    rebuilt outside the lock once the overlay holds more than max_pending entries
+    """
+
+    def __init__(self, leaf_size=32, max_pending=256, check_interval=30):
+        """
+        :param leaf_size: maximum number of points in a leaf of the tree
+        :param max_pending: maximum number of changed entries before the tree is rebuilt
+        :param check_interval: seconds between two checks whether the index is stale, see :meth:`~claim_check`
+        """
+        self._leaf_size = leaf_size
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._coordinates = {}
+        self._ids = np.empty(0, dtype=int)
+        self._tree = None
+        self._pending = {}
+        self._rebuilding = False
+        self.check_interval = check_interval
+        self._next_check = 0.0
+        self.state = None
+        self.built = False
+
+    def __len__(self):
+        return len(self._coordinates)
+
+    def _build_tree(self, coordinates):
+        ids = np.fromiter(coordinates.keys(), dtype=int, count=len(coordinates))
+        points = np.array(list(coordinates.values()), dtype=float).reshape(-1, 2)
+        tree = KDTree(to_cartesian(points[:, 0], points[:, 1]), self._leaf_size)
+
+        return ids[tree.order], tree
+
+    def build(self, rows, state=None):
+        """
+        replaces the content of the index
+        :param rows: iterable of (id, lat, long)
+        :param state: opaque description of the source the rows were read from, see :meth:`~claim_check`
+        """
+        coordinates = {row[0]: (row[1], row[2]) for row in rows}
+        ids, tree = self._build_tree(coordinates)
+
+        with self._lock:
+            self._coordinates = coordinates
+            self._ids, self._tree = ids, tree
+            self._pending = {}
+            self._next_check = time.monotonic() + self.check_interval
+            self.state = state
+            self.built = True
+
+    def claim_check(self):
+        """
+        the index only knows the changes made in this process, the caller compares the state of the source with
+        :attr:`~state` and rebuilds the index if they differ, only one caller per check interval is asked to do so
+        :return: True if the index has not been built or the check interval has passed
+        """
+        with self._lock:
+            if self.built and time.monotonic() < self._next_check:
+                return False
+
+            self._next_check = time.monotonic() + self.check_interval
+            return True
+
+    def update(self, identifier, lat, long):
+        """
+        inserts an entry or moves it to new coordinates
+        """
+        with self._lock:
+            self._coordinates[identifier] = (lat, long)
+            self._pending[identifier] = (lat, long)
+            rebuild = len(self._pending) > self._max_pending and not self._rebuilding
+            if rebuild:
+                self._rebuilding = True
+                coordinates = dict(self._coordinates)
+                merged = dict(self._pending)
+
+        if rebuild:
+            try:
+                ids, tree = self._build_tree(coordinates)
+                with self._lock:
+                    self._ids, self._tree = ids, tree
+                    # entries changed meanwhile stay in the overlay
+                    for key, value in merged.items():
+                        if self._pending.get(key) == value:
+                            del self._pending[key]
+            finally:
+                self._rebuilding = False
+
+    def coordinates(self, identifiers):
+        """
+        :param identifiers: ids of entries
+        :return: arrays of latitudes and longitudes of the entries
+        """
+        with self._lock:
+            coordinates = np.array([self._coordinates[i] for i in identifiers], dtype=float).reshape(-1, 2)
+
+        return coordinates[:, 0], coordinates[:, 1]
+
+    def _snapshot(self):
+        with self._lock:
+            return self._ids, self._tree, dict(self._pending)
+
+    @staticmethod
+    def _merge_pending(ids, chords, pending, point, radius):
+        # changed entries are only taken from the overlay, their old positions in the tree are dropped
+        if not pending:
+            return ids, chords
+
+        pending_ids = np.fromiter(pending.keys(), dtype=int, count=len(pending))
+        coordinates = np.array(list(pending.values()), dtype=float).reshape(-1, 2)
+        pending_chords = np.linalg.norm(to_cartesian(coordinates[:, 0], coordinates[:, 1]) - point, axis=1)
+        keep = ~np.isin(ids, pending_ids)
+        hits = pending_chords <= radius
+
+        return np.concatenate((ids[keep], pending_ids[hits])), np.concatenate((chords[keep], pending_chords[hits]))
+
+    def query_radius(self, lat, long, dist):
+        """
+        finds all entries within a given distance
+        :param lat: latitude of the reference point
+        :param long: longitude of the reference point
+        :param dist: maximum distance in km
+        :return: list of (id, distance in km), ordered by distance
+        """
+        ids, tree, pending = self._snapshot()
+        point = to_cartesian(lat, long)
+        radius = km_to_chord(dist)
+
+        if tree is not None:
+            positions, chords = tree.query_radius(point, radius)
+            ids = ids[positions]
+        else:
+            ids, chords = np.empty(0, dtype=int), np.empty(0)
+
+        ids, chords = self._merge_pending(ids, chords, pending, point, radius)
+        order = np.argsort(chords, kind='stable')
+
+        return list(zip(ids[order].tolist(), chord_to_km(chords[order]).tolist()))
+
+    def query_nearest(self, lat, long, k, max_dist=None):
+        """
+        finds the k entries closest to a given point
+        :param lat: latitude of the reference point
+        :param long: longitude of the reference point
+        :param k: maximum number of entries
+        :param max_dist: optional maximum distance in km
+        :return: list of (id, distance in km), ordered by distance
+        """
+        ids, tree, pending = self._snapshot()
+        point = to_cartesian(lat, long)
+        radius = math.inf if max_dist is None else km_to_chord(max_dist)
+
+        if tree is not None:
+            # entries shadowed by the overlay may take up to len(pending) of the places
+            positions, chords = tree.query_nearest(point, k + len(pending), radius)
+            ids = ids[positions]
+        else:
+            ids, chords = np.empty(0, dtype=int), np.empty(0)
+
+        ids, chords = self._merge_pending(ids, chords, pending, point, radius)
+        order = np.argsort(chords, kind='stable')[:k]
+
+        return list(zip(ids[order].tolist(), chord_to_km(chords[order]).tolist()))
+
+
+location_index = SpatialIndex(check_interval=Config.LOCATION_INDEX_CHECK_INTERVAL)
@@ -11,6 +11,18 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_SUBJECT_PREFIX = '[OutdoorTrips]'
     MAIL_SENDER = 'OutdoorTrips Service <outdoor-trips@posteo.de>'
+    # emails are stored in the outbox table and sent by a background thread of each serving process with
+    # MAIL_OUTBOX_WORKER set, which starts with the first request, failed emails are retried after
+    # MAIL_RETRY_BACKOFF * 2^(attempts - 1) seconds
+    MAIL_OUTBOX_WORKER = os.environ.get('MAIL_OUTBOX_WORKER', 'true').lower() in ['true', 'on', '1']
+    MAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('MAIL_OUTBOX_BATCH_SIZE', 50))
+    MAIL_OUTBOX_POLL_INTERVAL = int(os.environ.get('MAIL_OUTBOX_POLL_INTERVAL', 5))
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 6))
+    MAIL_RETRY_BACKOFF = int(os.environ.get('MAIL_RETRY_BACKOFF', 30))
+    MAIL_CONNECTION_IDLE = int(os.environ.get('MAIL_CONNECTION_IDLE', 60))
+    MAIL_TIMEOUT = int(os.environ.get('MAIL_TIMEOUT', 10))
+    # email templates are read again once their files change
+    MAIL_TEMPLATE_RELOAD = False
     ADMIN = os.environ.get('ADMIN')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     DEV_DATABASE_USER = os.environ.get('DEV_DATABASE_USER')
@@ -25,10 +37,66 @@ class Config:
     TEST_DATABASE_PASSWORD = os.environ.get('TEST_DATABASE_PASSWORD')
     TEST_DATABASE_NAME = os.environ.get('TEST_DATABASE_NAME')
     TEST_DATABASE_HOST = os.environ.get('TEST_DATABASE_HOST')
+    # connection pool of the engine, connections are recycled after DATABASE_POOL_RECYCLE seconds and checked
+    # before use with DATABASE_POOL_PRE_PING
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 10))
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+    DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT', 10))
+    DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+    DATABASE_POOL_PRE_PING = os.environ.get('DATABASE_POOL_PRE_PING', 'true').lower() in ['true', 'on', '1']
     PATH_PDF_STORAGE = os.environ.get('PDF_STORAGE')
     S3_KEY = os.environ.get('S3_KEY')
     S3_SECRET = os.environ.get('S3_SECRET')
     S3_BUCKET = os.environ.get('S3_BUCKET')
+    # 'index': in-memory spatial index, 'table': bounding box query on the locations table,
+    # 'sql': distance filter, ordering and limit evaluated by the database
+    FIND_TOUR_MODE = os.environ.get('FIND_TOUR_MODE', 'index')
+    # the spatial index of the 'index' mode only sees the writes of its own process, other worker processes pick up
+    # created, moved or deleted locations after at most LOCATION_INDEX_CHECK_INTERVAL seconds
+    LOCATION_INDEX_CHECK_INTERVAL = int(os.environ.get('LOCATION_INDEX_CHECK_INTERVAL', 30))
+    # corridor searches use CORRIDOR_DEFAULT_WIDTH km if no width is requested, routes with more than
+    # CORRIDOR_MAX_WAYPOINTS waypoints or widths above CORRIDOR_MAX_WIDTH km are rejected
+    CORRIDOR_DEFAULT_WIDTH = float(os.environ.get('CORRIDOR_DEFAULT_WIDTH', 5))
+    CORRIDOR_MAX_WIDTH = float(os.environ.get('CORRIDOR_MAX_WIDTH', 50))
+    CORRIDOR_MAX_WAYPOINTS = int(os.environ.get('CORRIDOR_MAX_WAYPOINTS', 100))
+    # searches answered by one find_tour_batch request
+    MAX_BATCH_QUERIES = int(os.environ.get('MAX_BATCH_QUERIES', 20))
+    # results of find_tour are cached per process and dropped by the writes of that process, other worker processes
+    # drop them once their location index is rebuilt, see LOCATION_INDEX_CHECK_INTERVAL, changes of activities only
+    # and all changes in the 'table' and 'sql' modes are served from their cache for up to TOUR_CACHE_TTL seconds
+    TOUR_CACHE_SIZE = int(os.environ.get('TOUR_CACHE_SIZE', 2048))
+    TOUR_CACHE_TTL = int(os.environ.get('TOUR_CACHE_TTL', 300))
+    # 'fts': ranked full text search, falls back to 'ilike' without results,
+    # 'ilike': similar names or names and descriptions containing the term, ranked by similarity
+    TERM_SEARCH_MODE = os.environ.get('TERM_SEARCH_MODE', 'fts')
+    TERM_SEARCH_LIMIT = int(os.environ.get('TERM_SEARCH_LIMIT', 50))
+    AUTOCOMPLETE_LIMIT = int(os.environ.get('AUTOCOMPLETE_LIMIT', 10))
+    # names created or renamed by other worker processes are completed after at most AUTOCOMPLETE_CHECK_INTERVAL
+    # seconds
+    AUTOCOMPLETE_CHECK_INTERVAL = int(os.environ.get('AUTOCOMPLETE_CHECK_INTERVAL', 30))
+    # rows fetched at once by streamed list responses
+    LIST_STREAM_BATCH_SIZE = int(os.environ.get('LIST_STREAM_BATCH_SIZE', 500))
+    # 'orjson', 'stdlib' or 'auto', which uses orjson if it is installed
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+    # content encodings offered for responses in order of preference, e.g. 'br,gzip', none by default
+    RESPONSE_COMPRESSION = [e for e in os.environ.get('RESPONSE_COMPRESSION', '').split(',') if e]
+    RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get('RESPONSE_COMPRESSION_MIN_SIZE', 1024))
+    REQUEST_SPEC_CACHE_SIZE = int(os.environ.get('REQUEST_SPEC_CACHE_SIZE', 1024))
+    # shared marshmallow schema instances per schema class, many and only
+    SCHEMA_CACHE_SIZE = int(os.environ.get('SCHEMA_CACHE_SIZE', 256))
+    # verified auth tokens, other worker processes notice a new session id of a user after AUTH_CACHE_TTL seconds
+    AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 4096))
+    AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', 60))
+    # 'session': every issued token replaces the session id of the user, 'stateless': tokens stay valid until logout
+    # or password change and are issued without a database write
+    AUTH_TOKEN_MODE = os.environ.get('AUTH_TOKEN_MODE', 'session')
+    # permissions of all roles are kept in memory and reloaded after ROLE_CACHE_TTL seconds
+    ROLE_CACHE_TTL = int(os.environ.get('ROLE_CACHE_TTL', 300))
+    # password hashes are computed by HASHING_WORKERS threads, requests beyond HASHING_QUEUE_DEPTH waiting ones
+    # are answered with 503, existing hashes keep the number of iterations they were created with
+    HASHING_WORKERS = int(os.environ.get('HASHING_WORKERS', 2))
+    HASHING_QUEUE_DEPTH = int(os.environ.get('HASHING_QUEUE_DEPTH', 16))
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 150000))
 
     @staticmethod
     def init_app(app):
@@ -37,6 +105,7 @@ class Config:
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    MAIL_TEMPLATE_RELOAD = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATBASE_URL') or \
                               'postgresql://{}:{}@{}/{}'.format(Config.DEV_DATABASE_USER, Config.DEV_DATABASE_PASSWORD,
                                                                 Config.DEV_DATABASE_HOST, Config.DEV_DATABASE_NAME)
@@ -50,6 +119,15 @@ class ProductionConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
+    DATABASE_POOL_SIZE = int(os.environ.get('TEST_DATABASE_POOL_SIZE', 2))
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('TEST_PASSWORD_HASH_ITERATIONS', 1000))
+    # local SMTP stand-in without TLS, e.g. python -m aiosmtpd -n -l localhost:1025
+    MAIL_SERVER = os.environ.get('TEST_MAIL_SERVER', 'localhost')
+    MAIL_PORT = int(os.environ.get('TEST_MAIL_PORT', 1025))
+    MAIL_USE_TLS = False
+    MAIL_USERNAME = None
+    # no sender thread polls the tables dropped by the tests
+    MAIL_OUTBOX_WORKER = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('PROD_DATABASE_URL') or \
                               'postgresql://{}:{}@{}/{}'.format(Config.TEST_DATABASE_USER,
                                                                 Config.TEST_DATABASE_PASSWORD,
@@ -0,0 +1,46 @@
+"""
+Micro-benchmark of the cost per serialized row with and without the shared schema instances of cached_schema
+
+Usage: python scripts/bench_schema_cache.py [rows]
+
+Importing the entities connects to the database selected by FLASK_CONFIG, no rows are read or written.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.entities.entity import cached_schema  # noqa: E402
+from app.entities.location import Location, LocationSchema  # noqa: E402
+
+OUTPUT = ['id', 'name', 'lat', 'long']
+
+
+def per_row(dump, rows):
+    """
+    :return: microseconds per call of dump
+    """
+    start = time.perf_counter()
+    for _ in range(rows):
+        dump()
+
+    return (time.perf_counter() - start) / rows * 1e6
+
+
+def main(rows=20000):
+    location = Location(47.421, 10.985, 'Zugspitze', 1, 1, 1)
+    location.id = 1
+
+    # a new schema per row, as get_schema did before
+    uncached = per_row(lambda: LocationSchema(many=False, only=OUTPUT).dump(location), rows)
+    cached = per_row(lambda: cached_schema(LocationSchema, many=False, only=OUTPUT).dump(location), rows)
+
+    print('rows: {}'.format(rows))
+    print('new schema per row: {:8.1f} us/row'.format(uncached))
+    print('cached schema:      {:8.1f} us/row'.format(cached))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,7 @@
+import os
+import unittest
+
+# the engine is bound to the database of FLASK_CONFIG at import time, tests which create and drop the tables must
+# never run against the development or production database
+requires_test_database = unittest.skipUnless(os.environ.get('FLASK_CONFIG') == 'test',
+                                             'FLASK_CONFIG=test is required, the tables are dropped afterwards')
@@ -0,0 +1,63 @@
+import base64
+import time
+import unittest
+
+from app import create_app
+from app.entities.entity import Base, Session, engine
+from app.entities.user import User
+from app.init import init_db
+from app.utils.auth_cache import Principal, TokenCache, token_cache
+from tests import requires_test_database
+
+
+class TokenCacheTestCase(unittest.TestCase):
+
+    def test_entry_expires_with_token(self):
+        cache = TokenCache(ttl=60)
+        cache.set('token', Principal(1, 1, True), expires_at=time.time() + 0.5)
+        self.assertIsNotNone(cache.get('token'))
+
+        time.sleep(0.7)
+        self.assertIsNone(cache.get('token'))
+
+    def test_expired_token_is_not_cached(self):
+        cache = TokenCache(ttl=60)
+        cache.set('token', Principal(1, 1, True), expires_at=time.time() - 1)
+        self.assertIsNone(cache.get('token'))
+        self.assertEqual(len(cache), 0)
+
+
+@requires_test_database
+class AuthTokenExpiryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app('test')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        init_db()
+        token_cache.clear()
+
+        session = Session()
+        self.user = User('tester', 'tester@example.com', 'password').create(session)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        token_cache.clear()
+        Session.remove()
+        Base.metadata.drop_all(engine)
+        self.app_context.pop()
+
+    def auth_headers(self, token):
+        return {'Authorization': 'Basic ' + base64.b64encode((token + ':').encode()).decode()}
+
+    def test_token_expiring_while_cached_is_rejected(self):
+        # the expiry is rounded down to full seconds, so the token is valid for at least two seconds
+        token = self.user.generate_auth_token(expiration=3, session=Session())
+
+        response = self.client.get('/main/stats/hikes/1', headers=self.auth_headers(token))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(token_cache.get(token))
+
+        time.sleep(4.2)
+        response = self.client.get('/main/stats/hikes/1', headers=self.auth_headers(token))
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,100 @@
+import base64
+import unittest
+
+from sqlalchemy import event
+
+from app import create_app
+from app.entities.activity import Activity
+from app.entities.activity_type import ActivityType
+from app.entities.country import Country
+from app.entities.entity import Base, Session, engine
+from app.entities.location import Location
+from app.entities.location_activity import LocationActivity
+from app.entities.location_type import LocationType
+from app.entities.region import Region
+from app.entities.role import Role
+from app.entities.user import User
+from app.init import init_db
+from app.main import build_location_index, tour_cache
+from tests import requires_test_database
+
+
+@requires_test_database
+class FindTourQueryCountTestCase(unittest.TestCase):
+    """
+    the number of statements issued by find_tour must not grow with the number of activities found
+    """
+
+    def setUp(self):
+        self.app = create_app('test')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        init_db()
+        tour_cache.clear()
+
+        session = Session()
+        role = session.query(Role).filter_by(name='User').first()
+        user = User('tester', 'tester@example.com', 'password', role_id=role.id).create(session)
+        country = Country('Deutschland', 'DE', user.id).create(session)
+        region = Region('Bayern', country.id, user.id).create(session)
+        location_type = LocationType('Gipfel', user.id).create(session)
+        activity_type = ActivityType('Wandern', user.id).create(session)
+
+        # many activities around the first point, a single one around the second
+        for idx in range(20):
+            self.add_activity(session, 'Tour {}'.format(idx), 47.5 + idx / 1000, 11.0, location_type, region,
+                              activity_type, user)
+        self.add_activity(session, 'Single Tour', 50.0, 8.0, location_type, region, activity_type, user)
+
+        build_location_index(session)
+        session.close()
+
+        self.client = self.app.test_client()
+        self.headers = {'Authorization': 'Basic ' + base64.b64encode(b'tester@example.com:password').decode()}
+        self.statements = []
+        event.listen(engine, 'before_cursor_execute', self.count_statement)
+
+    def tearDown(self):
+        event.remove(engine, 'before_cursor_execute', self.count_statement)
+        tour_cache.clear()
+        Session.remove()
+        Base.metadata.drop_all(engine)
+        self.app_context.pop()
+
+    @staticmethod
+    def add_activity(session, name, lat, long, location_type, region, activity_type, user):
+        location = Location(lat, long, name, location_type.id, region.id, user.id).create(session)
+        activity = Activity(name, name, activity_type.id, 'test', 'test/test.pdf', False, user.id).create(session)
+        LocationActivity(activity.id, location.id, user.id).create(session)
+
+    def count_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def find_tour(self, lat, long, status_code=200):
+        data = {'lat': lat, 'long': long, 'dist': 20, 'output': ['id', 'name']}
+        data_encoded = base64.b64encode(repr(data).encode()).decode()
+
+        self.statements.clear()
+        response = self.client.get('/main/find_tour/' + data_encoded, headers=self.headers)
+        self.assertEqual(response.status_code, status_code)
+
+        return response.get_json(), len(self.statements)
+
+    def assert_constant_query_count(self):
+        # the first request may build indexes and load roles, it finds nothing
+        self.find_tour(45.0, 5.0, status_code=400)
+
+        many, many_count = self.find_tour(47.5, 11.0)
+        single, single_count = self.find_tour(50.0, 8.0)
+
+        self.assertEqual(len(many), 20)
+        self.assertEqual(len(single), 1)
+        self.assertEqual(many_count, single_count)
+
+    def test_query_count_index_mode(self):
+        self.app.config['FIND_TOUR_MODE'] = 'index'
+        self.assert_constant_query_count()
+
+    def test_query_count_table_mode(self):
+        self.app.config['FIND_TOUR_MODE'] = 'table'
+        self.assert_constant_query_count()
@@ -0,0 +1,45 @@
+import unittest
+
+from app.entities.activity import Activity
+from app.main import DISTANCE_CURSOR
+from app.utils.helpers import encode_cursor
+from app.utils.request_spec import CURSOR_TYPES, InvalidRequestSpec, validate_page, validate_spec
+
+
+class EnrichSpecTestCase(unittest.TestCase):
+
+    def test_attribute_of_related_entity_is_accepted(self):
+        validate_spec({'enrich': {'get_hiker_all': 'username', 'get_region': 'name'}}, Activity, Activity)
+
+    def test_hidden_attributes_are_rejected(self):
+        for attribute in ('password_hash', 'session_id'):
+            with self.assertRaises(InvalidRequestSpec):
+                validate_spec({'enrich': {'get_hiker_all': attribute}}, Activity, Activity)
+
+    def test_unknown_attribute_is_rejected(self):
+        with self.assertRaises(InvalidRequestSpec):
+            validate_spec({'enrich': {'get_location': '__class__'}}, Activity, Activity)
+
+    def test_unknown_method_is_rejected(self):
+        with self.assertRaises(InvalidRequestSpec):
+            validate_spec({'enrich': {'get_schema': 'id'}}, Activity, Activity)
+
+
+class PageSpecTestCase(unittest.TestCase):
+
+    def test_positive_limit_and_cursor_are_accepted(self):
+        validate_page({'limit': 10, 'cursor': encode_cursor([1.5, 'Tour'])}, CURSOR_TYPES)
+
+    def test_invalid_limits_are_rejected(self):
+        for limit in ('10', -1, 0, True, 2.5):
+            with self.assertRaises(InvalidRequestSpec):
+                validate_page({'limit': limit}, CURSOR_TYPES)
+
+    def test_malformed_cursors_are_rejected(self):
+        for cursor in ('!!!', 'abc', 5, encode_cursor({'a': 1}), encode_cursor([1, 2, 3])):
+            with self.assertRaises(InvalidRequestSpec):
+                validate_page({'cursor': cursor}, CURSOR_TYPES)
+
+    def test_cursor_values_are_checked_against_the_types(self):
+        with self.assertRaises(InvalidRequestSpec):
+            validate_page({'cursor': encode_cursor(['far', 'Tour'])}, DISTANCE_CURSOR)